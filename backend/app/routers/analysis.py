@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
+import threading
 
 from app.services.chat_parser import ChatParser
 from app.services.analytics_service import AnalyticsService
@@ -12,6 +14,7 @@ router = APIRouter()
 
 # Global service instances
 _analytics_service = None
+_analytics_service_lock = threading.Lock()
 
 def get_analytics_service(
     parser: ChatParser = Depends(get_chat_parser),
@@ -20,17 +23,29 @@ def get_analytics_service(
     """Get or initialize the analytics service."""
     global _analytics_service
     if _analytics_service is None:
-        _analytics_service = AnalyticsService(parser, nlp_processor)
+        with _analytics_service_lock:
+            if _analytics_service is None:
+                _analytics_service = AnalyticsService(parser, nlp_processor)
     return _analytics_service
 
 @router.get("/overview")
 async def get_chat_analytics(
     sample_size: int = Query(10000, description="Number of messages to sample for analysis"),
+    include_topics: bool = Query(True, description="Extract topics from the sample"),
+    include_rankings: bool = Query(True, description="Rank users over all messages"),
+    include_activity: bool = Query(True, description="Compute peak hours and days"),
     analytics_service: AnalyticsService = Depends(get_analytics_service)
 ):
     """Get comprehensive analytics for the entire chat."""
     try:
-        analytics = analytics_service.generate_chat_analytics(sample_size=sample_size)
+        # Analytics parse the export synchronously, so they run in a worker thread
+        analytics = await run_in_threadpool(
+            analytics_service.generate_chat_analytics,
+            sample_size=sample_size,
+            want_topics=include_topics,
+            want_rankings=include_rankings,
+            want_activity=include_activity
+        )
         return analytics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating chat analytics: {str(e)}")
@@ -41,14 +56,8 @@ async def get_activity_patterns(
 ):
     """Get detailed activity patterns for the chat."""
     try:
-        # Generate the analytics with a smaller sample size
-        analytics = analytics_service.generate_chat_analytics(sample_size=5000)
-        
-        # Extract and format the activity data
-        return {
-            "peak_hours": analytics.peak_hours,
-            "peak_days": analytics.peak_days
-        }
+        # Only the sample scan is needed, with a smaller sample size
+        return await run_in_threadpool(analytics_service.compute_activity, sample_size=5000)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving activity patterns: {str(e)}")
 
@@ -58,12 +67,9 @@ async def get_chat_topics(
 ):
     """Get the main topics discussed in the chat."""
     try:
-        # Generate the analytics with a smaller sample size
-        analytics = analytics_service.generate_chat_analytics(sample_size=5000)
-        
-        # Return the topics
+        # Extract topics from a smaller sample size
         return {
-            "topics": analytics.top_topics
+            "topics": await run_in_threadpool(analytics_service.compute_topics, sample_size=5000)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving chat topics: {str(e)}")
@@ -74,16 +80,16 @@ async def get_user_rankings(
 ):
     """Get rankings of users based on various metrics."""
     try:
-        # Generate the analytics
-        analytics = analytics_service.generate_chat_analytics(sample_size=10000)
+        # Rankings cover all messages, so no sampling or topic extraction is needed
+        rankings = await run_in_threadpool(analytics_service.compute_rankings)
         
         # Return the user rankings
         return {
-            "most_active": analytics.most_active_users,
-            "emoji_users": analytics.emoji_users,
-            "media_users": analytics.media_users,
-            "long_message_users": analytics.long_message_users,
-            "forwarding_users": analytics.forwarding_users
+            "most_active": rankings['most_active_users'],
+            "emoji_users": rankings['emoji_users'],
+            "media_users": rankings['media_users'],
+            "long_message_users": rankings['long_message_users'],
+            "forwarding_users": rankings['forwarding_users']
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving user rankings: {str(e)}") 
\ No newline at end of file
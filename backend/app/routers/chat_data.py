@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 import os
+import threading
 
 from app.services.chat_parser import ChatParser
 
@@ -9,17 +11,21 @@ router = APIRouter()
 
 # Global chat parser instance
 _chat_parser = None
+_chat_parser_lock = threading.Lock()
 
 def get_chat_parser():
     """Get or initialize the chat parser."""
     global _chat_parser
     if _chat_parser is None:
-        # Get the path to the chat export file
-        file_path = os.environ.get("CHAT_FILE_PATH", "result.json")
-        
-        # Initialize the chat parser even if the file doesn't exist
-        # The ChatParser class has been updated to handle missing files gracefully
-        _chat_parser = ChatParser(file_path)
+        # Locked so concurrent first requests don't each build a parser
+        with _chat_parser_lock:
+            if _chat_parser is None:
+                # Get the path to the chat export file
+                file_path = os.environ.get("CHAT_FILE_PATH", "result.json")
+                
+                # Initialize the chat parser even if the file doesn't exist
+                # The ChatParser class has been updated to handle missing files gracefully
+                _chat_parser = ChatParser(file_path)
     
     return _chat_parser
 
@@ -27,7 +33,7 @@ def get_chat_parser():
 async def get_chat_info(parser: ChatParser = Depends(get_chat_parser)):
     """Get basic information about the chat."""
     try:
-        info = parser.get_chat_info()
+        info = await run_in_threadpool(parser.get_chat_info)
         return info
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving chat info: {str(e)}")
@@ -44,7 +50,8 @@ async def get_messages(
 ):
     """Get messages with pagination and filtering."""
     try:
-        messages = list(parser.stream_messages(
+        # Parsing reads the export synchronously, so it runs off the event loop
+        messages = await run_in_threadpool(list, parser.stream_messages(
             skip=skip,
             limit=limit,
             user_filter=user_id,
@@ -52,10 +59,11 @@ async def get_messages(
             date_to=date_to,
             message_types=message_type
         ))
+        total = await run_in_threadpool(lambda: parser.total_messages)
         
         return {
             "messages": messages,
-            "total": parser.total_messages,  # This is approximate
+            "total": total,  # This is approximate
             "offset": skip,
             "limit": limit
         }
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 
 from app.services.chat_parser import ChatParser
@@ -21,8 +22,9 @@ async def search_messages(
 ):
     """Search for messages containing the query text."""
     try:
-        # Perform the search
-        messages, total_count = parser.search_messages(
+        # Perform the search in a worker thread; it scans the whole export
+        messages, total_count = await run_in_threadpool(
+            parser.search_messages,
             query=query,
             user_ids=user_id,
             date_from=date_from,
@@ -52,7 +54,8 @@ async def advanced_search(
     """Advanced search with more complex criteria."""
     try:
         # Perform the search using the search query model
-        messages, total_count = parser.search_messages(
+        messages, total_count = await run_in_threadpool(
+            parser.search_messages,
             query=search_query.query,
             user_ids=search_query.user_ids,
             date_from=search_query.date_from,
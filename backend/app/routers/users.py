@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 import logging
+import threading
 
 from app.services.chat_parser import ChatParser
 from app.services.user_analyzer import UserAnalyzer
@@ -13,6 +15,13 @@ router = APIRouter()
 # Global services
 _user_analyzer = None
 _nlp_processor = None
+_services_lock = threading.Lock()
+
+# Profiles of this many of the most active users are built in the background
+# once the user list has been served, since clients open profiles from it next
+PROFILE_WARMUP_COUNT = 50
+_warmup_version = None
+_warmup_lock = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +29,9 @@ def get_nlp_processor():
     """Get or initialize the NLP processor."""
     global _nlp_processor
     if _nlp_processor is None:
-        _nlp_processor = NLPProcessor()
+        with _services_lock:
+            if _nlp_processor is None:
+                _nlp_processor = NLPProcessor()
     return _nlp_processor
 
 def get_user_analyzer(parser: ChatParser = Depends(get_chat_parser),
@@ -28,14 +39,61 @@ def get_user_analyzer(parser: ChatParser = Depends(get_chat_parser),
     """Get or initialize the user analyzer."""
     global _user_analyzer
     if _user_analyzer is None:
-        _user_analyzer = UserAnalyzer(parser, nlp_processor)
+        with _services_lock:
+            if _user_analyzer is None:
+                _user_analyzer = UserAnalyzer(parser, nlp_processor)
     return _user_analyzer
 
+def _export_etag(analyzer: UserAnalyzer) -> str:
+    """
+    Get an ETag for data derived from the chat export; it changes whenever the file does.
+    
+    The analyzer keys its caches on the same export version, so a response
+    is never older than the ETag sent with it.
+    """
+    return f'"{analyzer.export_version()}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the client's If-None-Match header already names the current ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def _cache_headers(analyzer: UserAnalyzer, etag: str) -> Dict[str, str]:
+    """Get HTTP caching headers, letting clients reuse a response as long as the analyzer caches it."""
+    return {"ETag": etag, "Cache-Control": f"max-age={analyzer.cache_ttl}"}
+
+def _warm_user_profiles(analyzer: UserAnalyzer, users: List[Dict[str, Any]]):
+    """Build and cache the profiles of the most active users, once per export version."""
+    global _warmup_version
+    version = analyzer.export_version()
+    with _warmup_lock:
+        if _warmup_version == version:
+            return
+        _warmup_version = version
+    
+    users = sorted(users, key=lambda user: user.get('message_count', 0), reverse=True)
+    analyzer.get_user_profiles([user['id'] for user in users[:PROFILE_WARMUP_COUNT]])
+
 @router.get("")
-async def get_users(analyzer: UserAnalyzer = Depends(get_user_analyzer)):
+async def get_users(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    analyzer: UserAnalyzer = Depends(get_user_analyzer)
+):
     """Get a list of all users in the chat."""
     try:
-        users = analyzer.get_user_list()
+        # An unchanged export means the client's copy is still current
+        etag = _export_etag(analyzer)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_cache_headers(analyzer, etag))
+        
+        users = await run_in_threadpool(analyzer.get_user_list)
+        response.headers.update(_cache_headers(analyzer, etag))
+        background_tasks.add_task(_warm_user_profiles, analyzer, users)
         return users
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving users: {str(e)}")
@@ -43,11 +101,23 @@ async def get_users(analyzer: UserAnalyzer = Depends(get_user_analyzer)):
 @router.get("/{user_id}")
 async def get_user_profile(
     user_id: str,
+    request: Request,
+    response: Response,
     analyzer: UserAnalyzer = Depends(get_user_analyzer)
 ):
     """Get detailed profile for a specific user."""
     try:
-        profile = analyzer.get_user_profile(user_id)
+        # An unchanged export means the client's copy is still current
+        etag = _export_etag(analyzer)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_cache_headers(analyzer, etag))
+        
+        profile = await run_in_threadpool(analyzer.get_user_profile, user_id)
+        
+        # Error and unknown-user fallbacks have no messages; they are not
+        # cached by the analyzer, so clients must not keep them either
+        if profile.message_count:
+            response.headers.update(_cache_headers(analyzer, etag))
         return profile
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving user profile: {str(e)}")
@@ -63,7 +133,7 @@ async def get_user_messages(
 ):
     """Get messages from a specific user."""
     try:
-        messages = list(parser.stream_messages(
+        messages = await run_in_threadpool(list, parser.stream_messages(
             skip=skip,
             limit=limit,
             user_filter=[user_id]
@@ -73,9 +143,9 @@ async def get_user_messages(
         if sort_by == "date":
             try:
                 if sort_order == "desc":
-                    messages.sort(key=lambda x: x.date if hasattr(x, 'date') else '', reverse=True)
+                    messages.sort(key=lambda x: x.date, reverse=True)
                 else:
-                    messages.sort(key=lambda x: x.date if hasattr(x, 'date') else '')
+                    messages.sort(key=lambda x: x.date)
             except Exception as e:
                 logger.error(f"Error sorting messages: {e}")
                 # If sorting fails, at least return the messages without crashing
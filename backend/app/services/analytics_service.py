@@ -1,19 +1,46 @@
 import logging
 from typing import Dict, List, Any, Optional, Union
-from collections import Counter, defaultdict
-from datetime import datetime
-import re
+from collections import Counter
 import os
 import time
-import json
+import hashlib
+import atexit
+import threading
+import orjson
 from functools import lru_cache
+import numpy as np
+import pandas as pd
 
 from app.services.chat_parser import ChatParser
 from app.services.nlp_service import NLPProcessor
 from app.models.chat_models import GroupChatAnalytics
+from app.utils.text_helpers import EMOJI_CHARS
+from app.utils.aggregation import HAVE_NUMBA, aggregate_by_user, bincount_by_user, count_bins, rank_users
 
 logger = logging.getLogger(__name__)
 
+# Seconds to collect cache writes before they are flushed to disk together
+CACHE_FLUSH_DELAY = 5.0
+
+# Maximum number of sampled messages used as topic documents
+TOPIC_TEXT_LIMIT = 1000
+
+# Leading date fields of an export timestamp (YYYY-MM-DDTHH:MM:SS)
+DATE_FIELDS_PATTERN = r'^(\d{4})-(\d{2})-(\d{2})T(\d{2})'
+
+def _weekdays(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Get the weekdays (Monday is 0) of Gregorian dates with integer arithmetic."""
+    # Days since 1970-01-01 via the days-from-civil algorithm
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    
+    # 1970-01-01 was a Thursday
+    return (days + 3) % 7
+
 class AnalyticsService:
     """Service for generating group chat analytics."""
     
@@ -27,12 +54,74 @@ class AnalyticsService:
         """
         self.chat_parser = chat_parser
         self.nlp_processor = nlp_processor or NLPProcessor()
-        self.url_pattern = re.compile(r'https?://\S+|www\.\S+')
-        self.emoji_pattern = re.compile(r':[a-zA-Z0-9_]+:')
         self.cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache")
         self._ensure_cache_dir()
         self.cache_ttl = 3600  # Cache validity in seconds (1 hour)
         
+        # Cache writes are held here by path and flushed in one batch shortly
+        # after, so a sweep over many sample sizes writes each file only once
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._flush_timer = None
+        atexit.register(self._flush_cache)
+        
+        # In-memory memoization keyed on (file version, sample size); a changed
+        # export gets a new mtime and therefore new cache entries
+        self._rankings_memo = lru_cache(maxsize=8)(self._rankings_uncached)
+        self._sample_memo = lru_cache(maxsize=8)(self._scan_sample)
+        self._topics_memo = lru_cache(maxsize=8)(self._topics_uncached)
+        self._analytics_memo = lru_cache(maxsize=8)(self._analytics_uncached)
+        
+        # Cache keys repeat on every read and write, so each path is joined once
+        self._cache_path_memo = lru_cache(maxsize=4096)(self._get_cache_path)
+        
+    def _count_emojis(self, text: str) -> int:
+        """Count Unicode emoji in flattened message text."""
+        # Emoji are never ASCII, and isascii() is a constant-time flag check
+        if text.isascii():
+            return 0
+        return sum(map(EMOJI_CHARS.__contains__, text))
+    
+    def _compute_user_rankings(self, frame) -> Dict[str, Any]:
+        """
+        Rank users by activity metrics over the columnar message frame.
+        
+        Args:
+            frame: Message frame from ChatParser.get_message_frame()
+            
+        Returns:
+            Dictionary with active_users and the top-20 ranking lists
+        """
+        frame = frame[frame['from_id'].notna() & (frame['from_id'] != '')]
+        emoji_counts = frame['text'].map(self._count_emojis)
+        
+        # Factorize keeps first-seen order, so codes double as the tie-breaker
+        codes, user_ids = pd.factorize(frame['from_id'])
+        values = np.vstack([
+            np.ones(len(frame), dtype=np.int64),
+            emoji_counts.to_numpy(dtype=np.int64),
+            frame['has_media'].to_numpy(dtype=np.int64),
+            (frame['text_len'] > 200).to_numpy(dtype=np.int64),
+            frame['is_forwarded'].to_numpy(dtype=np.int64),
+        ])
+        aggregate = aggregate_by_user if HAVE_NUMBA else bincount_by_user
+        totals, first = aggregate(codes.astype(np.int64), values, len(user_ids))
+        
+        ranked = [
+            [{"user_id": user_ids[u], "count": int(totals[m, u])} for u in rank_users(totals[m], first[m])]
+            for m in range(len(values))
+        ]
+        active_users = len(user_ids)
+        
+        return {
+            "active_users": active_users,
+            "most_active_users": ranked[0],
+            "emoji_users": ranked[1],
+            "media_users": ranked[2],
+            "long_message_users": ranked[3],
+            "forwarding_users": ranked[4],
+        }
+    
     def _ensure_cache_dir(self):
         """Create cache directory if it doesn't exist."""
         if not os.path.exists(self.cache_dir):
@@ -49,22 +138,37 @@ class AnalyticsService:
     
     def _cache_is_valid(self, cache_path):
         """Check if cache exists and is not expired."""
-        if not os.path.exists(cache_path):
+        # A single stat answers both questions
+        try:
+            mtime = os.stat(cache_path).st_mtime
+        except OSError:
             return False
         
         # Check if cache file is newer than TTL
-        file_age = time.time() - os.path.getmtime(cache_path)
-        return file_age < self.cache_ttl
+        return time.time() - mtime < self.cache_ttl
     
-    def _read_from_cache(self, key, sample_size=None):
-        """Try to read data from cache."""
-        cache_path = self._get_cache_path(key, sample_size)
+    def _read_from_cache(self, key, sample_size=None, raw=False):
+        """
+        Try to read data from cache.
+        
+        Entries are converted back to GroupChatAnalytics unless ``raw`` is set,
+        in which case the decoded JSON is returned as-is.
+        """
+        cache_path = self._cache_path_memo(key, sample_size)
+        
+        # Entries waiting to be flushed are newer than anything on disk
+        with self._dirty_lock:
+            pending = self._dirty.get(cache_path)
+        if pending is not None:
+            return pending if raw else GroupChatAnalytics(**pending)
         
         if self._cache_is_valid(cache_path):
             try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
+                with open(cache_path, 'rb') as f:
                     logger.info(f"Loading analytics from cache: {cache_path}")
-                    data = json.load(f)
+                    data = orjson.loads(f.read())
+                    if raw:
+                        return data
                     
                     # Convert the JSON data back to GroupChatAnalytics object
                     return GroupChatAnalytics(**data)
@@ -74,8 +178,8 @@ class AnalyticsService:
         return None
     
     def _write_to_cache(self, key, data, sample_size=None):
-        """Write data to cache."""
-        cache_path = self._get_cache_path(key, sample_size)
+        """Queue data for the next cache flush."""
+        cache_path = self._cache_path_memo(key, sample_size)
         
         try:
             # Ensure data is serializable by converting to dict
@@ -84,11 +188,34 @@ class AnalyticsService:
             else:
                 data_dict = data
                 
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                logger.info(f"Writing analytics to cache: {cache_path}")
-                json.dump(data_dict, f, ensure_ascii=False, indent=2)
+            with self._dirty_lock:
+                self._dirty[cache_path] = data_dict
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(CACHE_FLUSH_DELAY, self._flush_cache)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
         except Exception as e:
             logger.error(f"Error writing to cache: {e}")
+    
+    def _flush_cache(self):
+        """Write every queued cache entry to disk, replacing each file atomically."""
+        with self._dirty_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            
+            for cache_path, data_dict in self._dirty.items():
+                tmp_path = f"{cache_path}.tmp"
+                try:
+                    # Compact orjson output; integer keys such as peak hours become
+                    # strings as they did with json, and NumPy values are serialized natively
+                    with open(tmp_path, 'wb') as f:
+                        logger.info(f"Writing analytics to cache: {cache_path}")
+                        f.write(orjson.dumps(data_dict, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+                    os.replace(tmp_path, cache_path)
+                except Exception as e:
+                    logger.error(f"Error writing to cache: {e}")
+            self._dirty.clear()
             
     def get_mock_analytics(self) -> GroupChatAnalytics:
         """Generate mock analytics data for development and testing."""
@@ -111,183 +238,223 @@ class AnalyticsService:
             forwarding_users=[]
         )
         
-    def generate_chat_analytics(self, sample_size: int = None) -> GroupChatAnalytics:
+    def _is_mock(self) -> bool:
+        """Check whether the parser is serving mock data instead of a real export."""
+        return not os.path.exists(self.chat_parser.file_path) or self.chat_parser.file_path.endswith("mock_data.json")
+    
+    def _file_version(self) -> int:
+        """Get the modification time of the export, used to key in-memory caches."""
+        return os.stat(self.chat_parser.file_path).st_mtime_ns
+    
+    def compute_rankings(self) -> Dict[str, Any]:
+        """
+        Get user rankings over all messages in the chat.
+        
+        Returns:
+            Dictionary with active_users and the top-20 ranking lists
+        """
+        if self._is_mock():
+            mock = self.get_mock_analytics()
+            return {
+                "active_users": mock.active_users,
+                "most_active_users": mock.most_active_users,
+                "emoji_users": mock.emoji_users,
+                "media_users": mock.media_users,
+                "long_message_users": mock.long_message_users,
+                "forwarding_users": mock.forwarding_users,
+            }
+        return self._rankings_memo(self._file_version())
+    
+    def compute_activity(self, sample_size: int = None) -> Dict[str, Any]:
+        """
+        Get peak hours and days from a sample of messages.
+        
+        Args:
+            sample_size: Number of messages to sample (defaults to 10000)
+            
+        Returns:
+            Dictionary with peak_hours and peak_days
+        """
+        if self._is_mock():
+            mock = self.get_mock_analytics()
+            return {"peak_hours": mock.peak_hours, "peak_days": mock.peak_days}
+        
+        return self._peak_activity(self._file_version(), sample_size)
+    
+    def compute_topics(self, sample_size: int = None) -> List[Dict[str, Any]]:
+        """
+        Get the main topics from a sample of messages.
+        
+        Args:
+            sample_size: Number of messages to sample (defaults to 10000)
+            
+        Returns:
+            List of {"topic": str, "weight": float} dictionaries
+        """
+        if self._is_mock():
+            return self.get_mock_analytics().top_topics
+        return self._topics_memo(self._file_version(), sample_size)
+    
+    def _rankings_uncached(self, version: int) -> Dict[str, Any]:
+        """Compute user rankings; ``version`` only keys the memo."""
+        logger.info("Counting user message activity...")
+        return self._compute_user_rankings(self.chat_parser.get_message_frame())
+    
+    def _scan_sample(self, version: int, sample_size: int = None, collect_text: bool = True):
+        """
+        Scan a sample of messages for time patterns and topic text.
+        
+        Args:
+            version: File version, only used to key the memo
+            sample_size: Number of messages to sample (defaults to 10000)
+            collect_text: Whether to gather message text for topic extraction
+            
+        Returns:
+            Tuple of (hour_counts, day_counts, weekday_counts, all_text); all_text
+            holds the first TOPIC_TEXT_LIMIT non-empty texts, or none when
+            collect_text is False
+        """
+        logger.info("Processing message sample for detailed analysis...")
+        
+        # The sample is the leading rows of the cached message frame, the same
+        # one the rankings use, so the export is only parsed once
+        actual_sample_size = min(sample_size or 10000, self.chat_parser.total_messages)
+        # Only the sampled rows are copied, not every message row of the frame
+        frame = self.chat_parser.get_message_frame()
+        positions = np.flatnonzero(frame['is_message'].to_numpy())[:actual_sample_size]
+        sample = frame.take(positions)
+        
+        # Analyze message date/time patterns on whole columns; messages whose
+        # date does not follow the export layout are left out
+        dates = sample['date'].astype(str)
+        fields = dates.str.extract(DATE_FIELDS_PATTERN).dropna().to_numpy(dtype=np.int64)
+        year, month, day, hour = fields.T
+        hour_counts = count_bins(hour, 24)
+        
+        # Days are packed into YYYYMMDD integers; distinct days are few, so each
+        # weekday and date string is computed once per day
+        day_codes, days = pd.factorize(year * 10000 + month * 100 + day)
+        day_totals = np.bincount(day_codes, minlength=len(days))
+        day_counts = Counter({
+            f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}": int(total)
+            for key, total in zip(days.tolist(), day_totals)
+        })
+        day_weekdays = _weekdays(days // 10000, days // 100 % 100, days % 100)
+        weekday_counts = count_bins(day_weekdays[day_codes], 7)
+        
+        # Collect text for topic analysis, selecting non-empty rows on the length column
+        if collect_text:
+            all_text = sample.loc[sample['text_len'] > 0, 'text'].head(TOPIC_TEXT_LIMIT).tolist()
+        else:
+            all_text = []
+        
+        return hour_counts, day_counts, weekday_counts, all_text
+    
+    def _peak_activity(self, version: int, sample_size: int = None, collect_text: bool = False) -> Dict[str, Any]:
+        """
+        Calculate peak hours and days from the memoized sample scan.
+        
+        ``collect_text`` selects the scan that also gathered topic text, so a
+        caller that needs topics as well shares a single pass over the sample.
+        """
+        hour_counts, day_counts, _, _ = self._sample_memo(version, sample_size, collect_text)
+        return {
+            "peak_hours": dict(hour_counts.most_common(24)),
+            "peak_days": dict(sorted(day_counts.most_common(30), key=lambda x: x[0]))
+        }
+    
+    def _topics_uncached(self, version: int, sample_size: int = None) -> List[Dict[str, Any]]:
+        """Extract topics from the sampled text; ``version`` only keys the memo."""
+        _, _, _, all_text = self._sample_memo(version, sample_size, True)
+        
+        # Topics are cached by a hash of their input, so samples with the same
+        # text share the result whatever their size or the export's version
+        digest = hashlib.blake2b(b'num_topics=10', digest_size=16)
+        for text in all_text:
+            digest.update(text.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\x00')
+        cache_key = f"topics_{digest.hexdigest()}"
+        cached_topics = self._read_from_cache(cache_key, raw=True)
+        if cached_topics is not None:
+            return cached_topics
+        
+        # Extract topics from collected text, one document per message
+        topics = self.nlp_processor.extract_topics(all_text, num_topics=10)
+        result = [{"topic": t[0], "weight": t[1]} for t in topics]
+        self._write_to_cache(cache_key, result)
+        return result
+    
+    def _analytics_uncached(self, version: int, sample_size: int = None, want_topics: bool = True,
+                            want_rankings: bool = True, want_activity: bool = True) -> GroupChatAnalytics:
+        """Build the analytics object from the requested stages, going through the disk cache."""
+        # Partial results are cached separately from the full analytics, and the
+        # export version keeps a replaced export from being served stale results
+        skipped = [name for name, wanted in (("topics", want_topics), ("rankings", want_rankings),
+                                             ("activity", want_activity)) if not wanted]
+        cache_key = "_".join([f"chat_analytics_{version:x}"] + [f"no_{name}" for name in skipped])
+        
+        # Try to get from cache first
+        cached_data = self._read_from_cache(cache_key, sample_size)
+        if cached_data:
+            return cached_data
+        
+        rankings = self._rankings_memo(version) if want_rankings else {
+            "active_users": 0,
+            "most_active_users": [],
+            "emoji_users": [],
+            "media_users": [],
+            "long_message_users": [],
+            "forwarding_users": [],
+        }
+        if want_activity:
+            activity = self._peak_activity(version, sample_size, collect_text=want_topics)
+        else:
+            activity = {"peak_hours": {}, "peak_days": {}}
+        
+        # Create the analytics object
+        analytics = GroupChatAnalytics(
+            total_messages=self.chat_parser.total_messages,
+            active_users=rankings['active_users'],
+            peak_hours=activity['peak_hours'],
+            peak_days=activity['peak_days'],
+            top_topics=self._topics_memo(version, sample_size) if want_topics else [],
+            most_active_users=rankings['most_active_users'],
+            emoji_users=rankings['emoji_users'],
+            media_users=rankings['media_users'],
+            long_message_users=rankings['long_message_users'],
+            forwarding_users=rankings['forwarding_users'],
+            interaction_clusters=[]  # Placeholder for future implementation
+        )
+        
+        # Cache the results
+        self._write_to_cache(cache_key, analytics, sample_size)
+        
+        return analytics
+    
+    def generate_chat_analytics(self, sample_size: int = None, *, want_topics: bool = True,
+                                want_rankings: bool = True, want_activity: bool = True) -> GroupChatAnalytics:
         """
         Generate comprehensive analytics for the entire chat.
         
         Args:
             sample_size: Number of messages to sample for analysis (None means process all messages)
+            want_topics: Extract topics from the sample (skipped stages are left empty)
+            want_rankings: Rank users over all messages
+            want_activity: Compute peak hours and days from the sample
             
         Returns:
             GroupChatAnalytics object with detailed metrics
         """
         try:
             # Check if file exists or if it's a mock file
-            if not os.path.exists(self.chat_parser.file_path) or self.chat_parser.file_path.endswith("mock_data.json"):
+            if self._is_mock():
                 logger.info("Using mock analytics data")
                 return self.get_mock_analytics()
             
-            # Try to get from cache first
-            cached_data = self._read_from_cache("chat_analytics", sample_size)
-            if cached_data:
-                return cached_data
-                
-            # Get chat info
-            chat_info = self.chat_parser.get_chat_info()
-            total_messages = chat_info['total_messages']
-            
-            # For user rankings, process all messages to get accurate counts
-            logger.info("Counting user message activity...")
-            user_message_counts = Counter()
-            emoji_user_counts = defaultdict(int)
-            media_user_counts = defaultdict(int)
-            long_message_users = defaultdict(int)
-            forwarding_users = defaultdict(int)
-            
-            # First pass: get accurate user activity counts without limiting
-            for msg in self.chat_parser.stream_messages(limit=None):
-                if msg.type == 'service':
-                    continue
-                
-                # Count messages per user
-                if msg.from_id:
-                    user_message_counts[msg.from_id] += 1
-                
-                # Count emoji usage
-                if hasattr(msg, 'text'):
-                    emoji_count = 0
-                    if isinstance(msg.text, str):
-                        emoji_count = len(self.emoji_pattern.findall(msg.text))
-                    elif isinstance(msg.text, list):
-                        for item in msg.text:
-                            if isinstance(item, str):
-                                emoji_count += len(self.emoji_pattern.findall(item))
-                            elif isinstance(item, dict) and 'text' in item:
-                                emoji_count += len(self.emoji_pattern.findall(item['text']))
-                    
-                    if emoji_count > 0 and msg.from_id:
-                        emoji_user_counts[msg.from_id] += emoji_count
-                
-                # Count media sharing
-                if (hasattr(msg, 'media_type') and msg.media_type) or (hasattr(msg, 'photo') and msg.photo):
-                    if msg.from_id:
-                        media_user_counts[msg.from_id] += 1
-                
-                # Count long messages (> 200 chars)
-                if hasattr(msg, 'text'):
-                    text_length = 0
-                    if isinstance(msg.text, str):
-                        text_length = len(msg.text)
-                    elif isinstance(msg.text, list):
-                        for item in msg.text:
-                            if isinstance(item, str):
-                                text_length += len(item)
-                            elif isinstance(item, dict) and 'text' in item:
-                                text_length += len(item['text'])
-                    
-                    if text_length > 200 and msg.from_id:
-                        long_message_users[msg.from_id] += 1
-                
-                # Count forwarded messages
-                if hasattr(msg, 'forwarded_from') and msg.forwarded_from and msg.from_id:
-                    forwarding_users[msg.from_id] += 1
-            
-            # Now do detailed analysis on a sample of messages for topics, etc.
-            logger.info("Processing message sample for detailed analysis...")
-            hour_counts = Counter()
-            day_counts = Counter()
-            weekday_counts = Counter()
-            
-            # Aggregate text for topic analysis
-            all_text = []
-            
-            # Sample messages for pattern analysis
-            actual_sample_size = min(sample_size or 10000, total_messages)
-            sample_messages = list(self.chat_parser.stream_messages(limit=actual_sample_size))
-            
-            # Process each message in the sample
-            for msg in sample_messages:
-                # Skip service messages
-                if msg.type == 'service':
-                    continue
-                
-                # Analyze message date/time patterns
-                if msg.date:
-                    try:
-                        date = datetime.fromisoformat(msg.date)
-                        hour_counts[date.hour] += 1
-                        day_counts[date.strftime('%Y-%m-%d')] += 1
-                        weekday_counts[date.weekday()] += 1
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Collect text for topic analysis
-                if isinstance(msg.text, str) and msg.text:
-                    all_text.append(msg.text)
-                elif isinstance(msg.text, list):
-                    text_content = ""
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            text_content += item
-                        elif isinstance(item, dict) and 'text' in item:
-                            text_content += item['text']
-                    if text_content:
-                        all_text.append(text_content)
-            
-            # Extract topics from collected text
-            combined_text = " ".join(all_text[:1000])  # Limit to avoid overload
-            topics = self.nlp_processor.extract_topics(combined_text, num_topics=10)
-            
-            # Calculate peak activity
-            peak_hours = dict(hour_counts.most_common(24))
-            peak_days = dict(sorted(day_counts.most_common(30), key=lambda x: x[0]))
-            
-            # Convert defaultdicts to Counters for most_common() method
-            emoji_counter = Counter(emoji_user_counts)
-            media_counter = Counter(media_user_counts)
-            long_msg_counter = Counter(long_message_users)
-            fwd_counter = Counter(forwarding_users)
-            
-            # Get user rankings
-            most_active_users = [{"user_id": uid, "count": count} 
-                                for uid, count in user_message_counts.most_common(20)]
-            
-            emoji_users = [{"user_id": uid, "count": count} 
-                          for uid, count in emoji_counter.most_common(20)]
-            
-            media_users = [{"user_id": uid, "count": count} 
-                          for uid, count in media_counter.most_common(20)]
-            
-            long_msg_users = [{"user_id": uid, "count": count} 
-                             for uid, count in long_msg_counter.most_common(20)]
-            
-            fwd_users = [{"user_id": uid, "count": count} 
-                        for uid, count in fwd_counter.most_common(20)]
-            
-            # Create the analytics object
-            analytics = GroupChatAnalytics(
-                total_messages=total_messages,
-                active_users=len(user_message_counts),
-                peak_hours=peak_hours,
-                peak_days=peak_days,
-                top_topics=[{"topic": t[0], "weight": t[1]} for t in topics],
-                most_active_users=most_active_users,
-                emoji_users=emoji_users,
-                media_users=media_users,
-                long_message_users=long_msg_users,
-                forwarding_users=fwd_users,
-                interaction_clusters=[]  # Placeholder for future implementation
-            )
-            
-            # Cache the results
-            self._write_to_cache("chat_analytics", analytics, sample_size)
-            
-            return analytics
+            return self._analytics_memo(self._file_version(), sample_size, want_topics, want_rankings, want_activity)
             
         except Exception as e:
-            logger.error(f"Error generating chat analytics: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error generating chat analytics: {e}")
             
             # Return empty analytics with error indicator
             return GroupChatAnalytics(
@@ -301,4 +468,4 @@ class AnalyticsService:
                 media_users=[],
                 long_message_users=[],
                 forwarding_users=[]
-            ) 
\ No newline at end of file
+            )
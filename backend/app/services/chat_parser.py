@@ -1,16 +1,163 @@
 import os
+import sys
 import json
-import ijson
-from typing import Dict, List, Any, Optional, Generator, Tuple
+import mmap
+import orjson
+try:
+    # Prefer the C yajl backend explicitly; fall back to cffi, then pure Python
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    try:
+        import ijson.backends.yajl2_cffi as ijson
+    except ImportError:
+        import ijson
+from typing import Dict, List, Any, Optional, Generator, Tuple, Callable
 import logging
 from datetime import datetime
 import re
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import threading
+from itertools import islice, repeat
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+try:
+    # Optional: Hyperscan pre-screens messages for regex searches
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 from app.models.chat_models import ChatData, Message
+from app.utils.text_helpers import extract_text_content
+from app.utils.json_stream import field_marker, find_array, iter_object_spans, split_object_array
+from app.utils.search_index import SearchIndex
 
 logger = logging.getLogger(__name__)
 
+# Exports at least this large have their message frame built by a process pool
+PARALLEL_FRAME_BYTES = 64 * 1024 * 1024
+
+# Exports up to this size are parsed in one go and their messages kept in memory
+DOCUMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Slice size for counting messages in the memory-mapped export
+COUNT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Number of sender IDs gathered before they are counted in one Counter.update
+COUNT_BATCH_SIZE = 10000
+
+def _stop_scan(expr_id, start, end, flags, context):
+    """Hyperscan match handler that stops at the first match."""
+    return True
+
+@lru_cache(maxsize=64)
+def _compile_query(query: str):
+    """
+    Compile a search query once for repeated searches.
+    
+    Returns:
+        Tuple of (case-insensitive re pattern, Hyperscan database or None). The
+        database is only built for ASCII queries in syntax both engines read the
+        same way ('{' is excluded since re treats '{,n}' as a quantifier).
+    """
+    pattern = re.compile(query, re.IGNORECASE)
+    
+    database = None
+    if hyperscan is not None and query.isascii() and '{' not in query:
+        try:
+            database = hyperscan.Database()
+            database.compile(
+                expressions=[query.encode('ascii')],
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+            )
+        except Exception:
+            database = None  # Unsupported by Hyperscan (backreferences, lookarounds, ...)
+    return pattern, database
+
+def _message_filter(user_filter: Optional[List[str]], message_types: Optional[List[str]],
+                    from_date: Optional[datetime], to_date: Optional[datetime]) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """
+    Compose a predicate from only the filters that are set.
+    
+    Returns:
+        Function telling whether a raw message passes every filter, or None
+        when no filter is set and every message passes
+    """
+    checks = []
+    if user_filter:
+        user_ids = set(user_filter)
+        checks.append(lambda msg: msg.get('from_id') in user_ids)
+    if message_types:
+        types = set(message_types)
+        checks.append(lambda msg: msg.get('type') in types)
+    if from_date or to_date:
+        def in_date_range(msg):
+            try:
+                msg_date = datetime.fromisoformat(msg.get('date'))
+                if from_date and msg_date < from_date:
+                    return False
+                if to_date and msg_date > to_date:
+                    return False
+                return True
+            except (ValueError, TypeError):
+                # Skip messages with invalid dates
+                return False
+        checks.append(in_date_range)
+    
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda msg: all(check(msg) for check in checks)
+
+def _frame_from_messages(messages) -> pd.DataFrame:
+    """Build the columnar message view from raw message dicts."""
+    from_ids = []
+    dates = []
+    texts = []
+    text_lens = []
+    has_media = []
+    is_forwarded = []
+    is_message = []
+    
+    for msg in messages:
+        if msg.get('type') == 'service':
+            continue
+        
+        text = extract_text_content(msg.get('text', ''))
+        # A chat has few senders; interning keeps one string per sender in the
+        # frame instead of one per message, and equal IDs compare by identity
+        from_id = msg.get('from_id')
+        from_ids.append(sys.intern(from_id) if type(from_id) is str else from_id)
+        dates.append(msg.get('date'))
+        texts.append(text)
+        text_lens.append(len(text))
+        has_media.append(bool(msg.get('media_type') or msg.get('photo')))
+        is_forwarded.append(bool(msg.get('forwarded_from')))
+        is_message.append(msg.get('type') == 'message')
+    
+    return pd.DataFrame({
+        'from_id': pd.Series(from_ids, dtype=object),
+        'date': pd.Series(dates, dtype=object),
+        'text': pd.Series(texts, dtype=object),
+        'text_len': pd.Series(text_lens, dtype='int32'),
+        'has_media': pd.Series(has_media, dtype=bool),
+        'is_forwarded': pd.Series(is_forwarded, dtype=bool),
+        'is_message': pd.Series(is_message, dtype=bool),
+    })
+
+def _frame_from_range(file_path: str, array_start: int, start: int, stop: int) -> pd.DataFrame:
+    """Build the message frame for one byte range of an export (process pool worker)."""
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        spans = iter_object_spans(mm, array_start, start, stop)
+        marker = field_marker(mm, array_start, 'type', 'service')
+        return _frame_from_messages(
+            orjson.loads(mm[s:e]) for s, e in spans
+            if marker is None or mm.find(marker, s, e) == -1
+        )
+
 class ChatParser:
     """Service for parsing Telegram chat export files."""
     
@@ -19,6 +166,15 @@ class ChatParser:
         self.file_path = file_path
         self.users_cache = {}  # Cache user info for faster lookups
         self._total_messages = None
+        self._message_frame = None  # Columnar view of messages, see get_message_frame()
+        self._message_frame_mtime = None
+        self._search_index = None  # (SearchIndex, message byte spans), see _get_search_index()
+        self._search_index_mtime = None
+        # Builds of the message frame and search index are serialized, so
+        # concurrent cold requests wait for one build instead of each running their own
+        self._build_lock = threading.Lock()
+        self._messages_cache = None  # Parsed messages of small exports, see _cached_messages()
+        self._messages_cache_mtime = None
         
         # Check if file exists, use mock data if not
         if not os.path.exists(file_path):
@@ -50,16 +206,99 @@ class ChatParser:
     def _count_messages(self) -> None:
         """Count messages in the JSON file."""
         try:
+            if os.path.getsize(self.file_path) == 0:
+                self._total_messages = 0
+                return
+            
+            # Pretty-printed exports hold one '"type": "message"' per message, so
+            # the memory-mapped file is counted with bytes.count in large slices;
+            # each slice overlaps the next by len(needle) - 1 bytes so a match
+            # straddling a boundary is still counted exactly once
+            needle = b'"type": "message"'
             count = 0
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if '"type": "message"' in line:
-                        count += 1
+            with open(self.file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start in range(0, len(mm), COUNT_CHUNK_BYTES):
+                    count += mm[start:start + COUNT_CHUNK_BYTES + len(needle) - 1].count(needle)
             self._total_messages = count
         except Exception as e:
             logger.error(f"Error counting messages: {e}")
             self._total_messages = 0
     
+    def _iter_raw_messages(self, spans=None, skip_service: bool = False) -> Generator[Dict[str, Any], None, None]:
+        """
+        Yield the raw message dicts from the export file.
+        
+        Telegram exports are pretty-printed, so each message can be sliced out
+        of the memory-mapped file and decoded with orjson on its own. Files with
+        any other layout are streamed through ijson instead.
+        
+        Args:
+            spans: Byte spans of the messages to read (from the search index);
+                all messages are read when omitted
+            skip_service: Leave out service messages; in pretty-printed files
+                they are recognized from their bytes and never decoded
+        """
+        if spans is None:
+            messages = self._cached_messages()
+            if messages is not None:
+                if skip_service:
+                    messages = (msg for msg in messages if msg.get('type') != 'service')
+                yield from messages
+                return
+        
+        with open(self.file_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return  # Empty file
+            
+            with mm:
+                marker = None
+                try:
+                    array_start = find_array(mm, 'messages')
+                    if skip_service:
+                        marker = field_marker(mm, array_start, 'type', 'service')
+                    if spans is None:
+                        spans = iter_object_spans(mm, array_start)
+                except ValueError:
+                    pass
+                
+                if spans is not None:
+                    for start, end in spans:
+                        if marker is not None and mm.find(marker, start, end) != -1:
+                            continue
+                        yield orjson.loads(mm[start:end])
+                    return
+            
+            # ijson reads bytes directly, avoiding a UTF-8 decode of the whole stream
+            f.seek(0)
+            messages = ijson.items(f, 'messages.item')
+            if skip_service:
+                messages = (msg for msg in messages if msg.get('type') != 'service')
+            yield from messages
+    
+    def _cached_messages(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get all raw messages of a small export, parsing it again only when it changes.
+        
+        The whole document is decoded by a single orjson call, which is faster
+        than per-message decoding and lets repeated requests skip parsing.
+        
+        Returns:
+            List of message dicts (shared; callers must not modify them), or
+            None if the export is empty or too large to keep in memory
+        """
+        stat = os.stat(self.file_path)
+        if stat.st_size == 0 or stat.st_size > DOCUMENT_CACHE_BYTES:
+            return None
+        
+        if self._messages_cache_mtime != stat.st_mtime_ns:
+            with open(self.file_path, 'rb') as f:
+                data = orjson.loads(f.read())
+            self._messages_cache = data.get('messages', []) if isinstance(data, dict) else []
+            self._messages_cache_mtime = stat.st_mtime_ns
+        return self._messages_cache
+    
     def get_chat_info(self) -> Dict[str, Any]:
         """Extract basic chat information."""
         try:
@@ -73,7 +312,7 @@ class ChatParser:
                     "is_mock": True
                 }
             
-            with open(self.file_path, 'r', encoding='utf-8') as f:
+            with open(self.file_path, 'rb') as f:
                 # Read only the chat info part at the beginning
                 for prefix, event, value in ijson.parse(f):
                     if prefix == 'name' and event == 'string':
@@ -110,7 +349,9 @@ class ChatParser:
                         user_filter: Optional[List[str]] = None,
                         date_from: Optional[str] = None,
                         date_to: Optional[str] = None,
-                        message_types: Optional[List[str]] = None
+                        message_types: Optional[List[str]] = None,
+                        raw: bool = False,
+                        spans=None
                        ) -> Generator[Message, None, None]:
         """
         Stream messages from the JSON file with pagination and filtering.
@@ -122,9 +363,11 @@ class ChatParser:
             date_from: Filter messages from this date (ISO format)
             date_to: Filter messages up to this date (ISO format)
             message_types: Filter by message types
+            raw: Yield the decoded dicts as-is, skipping Message validation
+            spans: Only read the messages at these byte spans of the export
             
         Yields:
-            Message objects that match the criteria
+            Message objects (or raw dicts) that match the criteria
         """
         try:
             # Parse date filters if provided
@@ -134,57 +377,136 @@ class ChatParser:
             count = 0
             yielded = 0
             
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                for msg in ijson.items(f, 'messages.item'):
-                    # Apply filters
-                    if user_filter and msg.get('from_id') not in user_filter:
-                        continue
-                    
-                    if message_types and msg.get('type') not in message_types:
-                        continue
-                    
-                    # Apply date filter
-                    if from_date or to_date:
-                        try:
-                            msg_date = datetime.fromisoformat(msg.get('date'))
-                            if from_date and msg_date < from_date:
-                                continue
-                            if to_date and msg_date > to_date:
-                                continue
-                        except (ValueError, TypeError):
-                            # Skip messages with invalid dates
-                            continue
-                    
-                    # Skip messages for pagination
-                    if count < skip:
-                        count += 1
-                        continue
-                    
-                    # Create Message object and yield
-                    try:
-                        # Handle "from" field alias
-                        if 'from' in msg:
-                            msg['from_name'] = msg.pop('from')
-                        
-                        message = Message(**msg)
-                        yield message
-                        
-                        yielded += 1
-                        if limit and yielded >= limit:
-                            break
-                    except Exception as e:
-                        logger.error(f"Error parsing message {msg.get('id')}: {e}")
-                        continue
+            # The per-message checks are composed once from the filters in use
+            matches = _message_filter(user_filter, message_types, from_date, to_date)
+            
+            # Service messages are dropped before decoding unless requested
+            skip_service = bool(message_types) and 'service' not in message_types
+            for msg in self._iter_raw_messages(spans, skip_service):
+                # Apply filters
+                if matches is not None and not matches(msg):
+                    continue
+                
+                # Skip messages for pagination
+                if count < skip:
+                    count += 1
+                    continue
+                
+                if raw:
+                    yield msg
                     
+                    yielded += 1
+                    if limit and yielded >= limit:
+                        break
                     count += 1
+                    continue
+                
+                # Create Message object and yield
+                try:
+                    message = self._to_message(msg)
+                    yield message
                     
+                    yielded += 1
+                    if limit and yielded >= limit:
+                        break
+                except Exception as e:
+                    logger.error(f"Error parsing message {msg.get('id')}: {e}")
+                    continue
+                
+                count += 1
+                
         except Exception as e:
             logger.error(f"Error streaming messages: {e}")
             yield None
     
+    def get_message_frame(self) -> pd.DataFrame:
+        """
+        Get a columnar view of all non-service messages.
+        
+        The frame is built in a single pass over the export and cached until
+        the file changes. Columns: from_id, date, text (flattened), text_len,
+        has_media, is_forwarded, is_message (type is "message").
+        """
+        try:
+            mtime = os.path.getmtime(self.file_path)
+            if self._message_frame_mtime != mtime or self._message_frame is None:
+                with self._build_lock:
+                    if self._message_frame_mtime != mtime or self._message_frame is None:
+                        self._message_frame = self._build_message_frame()
+                        self._message_frame_mtime = mtime
+            return self._message_frame
+        except Exception as e:
+            logger.error(f"Error building message frame: {e}")
+            return self._build_message_frame([])
+    
+    def _build_message_frame(self, messages=None) -> pd.DataFrame:
+        """Build the columnar message view from raw message dicts."""
+        if messages is None:
+            frame = self._build_message_frame_parallel()
+            if frame is not None:
+                return frame
+            
+            batches = list(self.stream_columns())
+            return pd.concat(batches, ignore_index=True) if batches else _frame_from_messages([])
+        return _frame_from_messages(messages)
+    
+    def stream_columns(self, batch_size: int = 65536) -> Generator[pd.DataFrame, None, None]:
+        """
+        Stream the export as columnar batches of non-service messages.
+        
+        Each batch has the columns of get_message_frame() and covers up to
+        batch_size messages, so callers can aggregate column-wise without
+        per-message objects and without holding the whole export.
+        
+        Args:
+            batch_size: Maximum number of messages per batch
+            
+        Yields:
+            DataFrames in export order
+        """
+        messages = self._iter_raw_messages(skip_service=True)
+        while True:
+            chunk = list(islice(messages, batch_size))
+            if not chunk:
+                return
+            yield _frame_from_messages(chunk)
+    
+    def _build_message_frame_parallel(self) -> Optional[pd.DataFrame]:
+        """
+        Build the message frame across a process pool for large exports.
+        
+        The messages array is split into byte ranges on message boundaries and
+        each worker decodes its own range from the mapped file, so only the
+        finished columns cross process boundaries.
+        
+        Returns:
+            The frame, or None when the export is small, not pretty-printed,
+            or the pool could not be used
+        """
+        workers = os.cpu_count() or 1
+        if workers < 2 or os.path.getsize(self.file_path) < PARALLEL_FRAME_BYTES:
+            return None
+        
+        with open(self.file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                array_start = find_array(mm, 'messages')
+                ranges = split_object_array(mm, array_start, workers)
+            except ValueError:
+                return None
+        if len(ranges) < 2:
+            return None
+        
+        try:
+            starts, stops = zip(*ranges)
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                frames = list(pool.map(_frame_from_range, repeat(self.file_path), repeat(array_start), starts, stops))
+        except Exception as e:
+            logger.warning(f"Parallel message frame build failed, parsing in-process: {e}")
+            return None
+        return pd.concat(frames, ignore_index=True)
+    
     def get_user_ids(self) -> List[Dict[str, Any]]:
         """Get a list of all users in the chat."""
-        users = {}
         try:
             if not os.path.exists(self.file_path):
                 # Return mock data if file doesn't exist
@@ -194,24 +516,41 @@ class ChatParser:
                     {"id": "user3", "name": "User Three", "message_count": 1}
                 ]
             
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                for msg in ijson.items(f, 'messages.item'):
-                    if 'from_id' in msg and 'from' in msg:
-                        user_id = msg['from_id']
-                        if user_id and user_id not in users:
-                            users[user_id] = {
-                                'id': user_id,
-                                'name': msg.get('from', 'Unknown'),
-                                'message_count': 0
-                            }
-                        if user_id:
-                            users[user_id]['message_count'] += 1
+            # Sender IDs are gathered in chunks and counted with Counter.update,
+            # which counts in C; a user's first message records the name, and
+            # the user dicts are only built once at the end
+            names = {}
+            message_counts = Counter()
+            user_ids = []
+            for msg in self._iter_raw_messages():
+                if 'from_id' in msg and 'from' in msg:
+                    user_id = msg['from_id']
+                    if user_id:
+                        if user_id not in names:
+                            names[user_id] = msg.get('from', 'Unknown')
+                        user_ids.append(user_id)
+                        if len(user_ids) >= COUNT_BATCH_SIZE:
+                            message_counts.update(user_ids)
+                            user_ids.clear()
+            message_counts.update(user_ids)
             
-            return list(users.values())
+            return [
+                {'id': user_id, 'name': name, 'message_count': message_counts[user_id]}
+                for user_id, name in names.items()
+            ]
         except Exception as e:
             logger.error(f"Error getting user IDs: {e}")
             return []
             
+    @staticmethod
+    def _to_message(msg: Dict[str, Any]) -> Message:
+        """Build a Message from a raw message dict without modifying the dict."""
+        # Handle "from" field alias on a copy; the dict may be cached
+        if 'from' in msg:
+            msg = dict(msg)
+            msg['from_name'] = msg.pop('from')
+        return Message(**msg)
+    
     def search_messages(self, query: str, 
                         user_ids: Optional[List[str]] = None,
                         date_from: Optional[str] = None,
@@ -229,42 +568,95 @@ class ChatParser:
         total_count = 0
         
         try:
-            # Create regex pattern for the search query
-            pattern = re.compile(query, re.IGNORECASE)
+            # Create regex pattern for the search query (cached per query)
+            pattern, database = _compile_query(query)
+            scratch = hyperscan.Scratch(database) if database is not None else None
             
-            # Stream messages with filters
+            # Literal queries only need to look at the messages the index
+            # says may contain them; the pattern still decides below
+            spans = None
+            index = self._get_search_index()
+            if index is not None:
+                search_index, message_spans = index
+                positions = search_index.candidates(query)
+                if positions is not None:
+                    spans = message_spans[positions]
+            
+            # Stream raw messages with filters; only matches become Message objects
             for msg in self.stream_messages(
                 skip=0,  # We'll handle pagination manually to count total matches
                 user_filter=user_ids,
                 date_from=date_from,
                 date_to=date_to,
-                message_types=message_types
+                message_types=message_types,
+                raw=True,
+                spans=spans
             ):
-                # Check if message text matches the query
-                if isinstance(msg.text, str) and pattern.search(msg.text):
-                    total_count += 1
-                    
-                    # Apply pagination
-                    if total_count > skip and len(results) < limit:
-                        results.append(msg)
-                elif isinstance(msg.text, list):
-                    # Handle complex text structure (list of objects)
-                    text_content = ""
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            text_content += item
-                        elif isinstance(item, dict) and 'text' in item:
-                            text_content += item['text']
-                    
-                    if pattern.search(text_content):
-                        total_count += 1
-                        
-                        # Apply pagination
-                        if total_count > skip and len(results) < limit:
-                            results.append(msg)
+                # Check if message text matches the query; Hyperscan rules out
+                # ASCII texts first, and re confirms anything it lets through
+                text_content = extract_text_content(msg.get('text', ''))
+                if scratch is not None and text_content.isascii():
+                    try:
+                        database.scan(text_content.encode('ascii'), match_event_handler=_stop_scan, scratch=scratch)
+                        continue
+                    except hyperscan.ScanTerminated:
+                        pass
+                if not pattern.search(text_content):
+                    continue
+                
+                try:
+                    message = self._to_message(msg)
+                except Exception as e:
+                    logger.error(f"Error parsing message {msg.get('id')}: {e}")
+                    continue
+                total_count += 1
+                
+                # Apply pagination
+                if total_count > skip and len(results) < limit:
+                    results.append(message)
             
             return results, total_count
             
         except Exception as e:
             logger.error(f"Error searching messages: {e}")
-            return [], 0 
\ No newline at end of file
+            return [], 0
+    
+    def _get_search_index(self) -> Optional[Tuple[SearchIndex, np.ndarray]]:
+        """
+        Get the word index over message text, building it when the file changes.
+        
+        Returns:
+            Tuple of (index, message byte spans by position), or None when the
+            export is not pretty-printed and has to be scanned instead
+        """
+        try:
+            mtime = os.path.getmtime(self.file_path)
+            if self._search_index_mtime != mtime:
+                with self._build_lock:
+                    if self._search_index_mtime != mtime:
+                        self._search_index = self._build_search_index()
+                        self._search_index_mtime = mtime
+            return self._search_index
+        except Exception as e:
+            logger.error(f"Error building search index: {e}")
+            return None
+    
+    def _build_search_index(self) -> Optional[Tuple[SearchIndex, np.ndarray]]:
+        """Index the flattened text of every message in the export."""
+        logger.info("Building message search index...")
+        with open(self.file_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return None  # Empty file
+            
+            with mm:
+                try:
+                    spans = list(iter_object_spans(mm, find_array(mm, 'messages')))
+                except ValueError:
+                    return None
+                
+                texts = (extract_text_content(orjson.loads(mm[start:end]).get('text', '')) for start, end in spans)
+                index = SearchIndex(texts)
+        
+        return index, np.array(spans, dtype=np.int64).reshape(-1, 2)
@@ -1,19 +1,134 @@
+import os
 import re
 import logging
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Iterable, Union, Optional
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import string
 import numpy as np
 
 # For multilingual support
-import jieba
+try:
+    # Optional: jieba_fast is a drop-in jieba with a C segmentation core
+    import jieba_fast as jieba
+except ImportError:
+    import jieba
 import nltk
-from langdetect import detect
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from langdetect import DetectorFactory, PROFILES_DIRECTORY
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, TfidfTransformer
 from sklearn.decomposition import LatentDirichletAllocation
 
+from app.utils.text_helpers import URL_PATTERN, EMOJI_PATTERN
+
 logger = logging.getLogger(__name__)
 
+# jieba, langdetect and nltk compile patterns through the re module cache; with
+# mixed-language traffic the default size (512) evicts and recompiles hot ones
+if getattr(re, '_MAXCACHE', 0) < 4096:
+    re._MAXCACHE = 4096
+
+# Joins texts into one buffer for batch cleaning; it is whitespace to re, so
+# the URL and shortcode patterns cannot match across it
+TEXT_SEPARATOR = '\x1f'
+
+# Characters of a joined corpus that language detection looks at
+LANGUAGE_SAMPLE_LENGTH = 1000
+
+# Longest text whose detected language is cached
+DETECTION_CACHE_TEXT_LENGTH = 1000
+
+# Translation table that deletes ASCII punctuation, built once
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+
+# CJK Unified Ideographs; text containing them keeps its case in preprocessing
+_HAS_CJK = re.compile(r'[\u4e00-\u9fff]')
+
+# Word tokens for non-Chinese text; punctuation is already stripped by
+# preprocessing, so a plain word pattern stands in for NLTK's Treebank tokenizer
+_TOKEN_RE = re.compile(r'\w+')
+
+# Word tokens for batch TF-IDF (scikit-learn's default token pattern)
+_WORD_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+def _chinese_words(doc: str) -> List[str]:
+    """
+    Segment Chinese text with jieba into the terms CountVectorizer's default token pattern would keep.
+    
+    Used as the vectorizer's tokenizer, so segmented text is not joined with
+    spaces only to be split again. Single-character segments are dropped
+    without a regex call, as the pattern needs two word characters.
+    """
+    words = []
+    for token in jieba.cut(doc):
+        if len(token) > 1:
+            words.extend(_WORD_PATTERN.findall(token))
+    return words
+
+def _column_totals(matrix) -> np.ndarray:
+    """Sum a CSR matrix over its rows into a flat array, reading only the stored entries."""
+    return np.bincount(matrix.indices, weights=matrix.data, minlength=matrix.shape[1])
+
+def _term_mask(feature_names, stop_words: frozenset) -> np.ndarray:
+    """Flag the vocabulary terms usable as topics: not stopwords and longer than one character."""
+    return np.fromiter((len(w) > 1 and w not in stop_words for w in feature_names),
+                       dtype=bool, count=len(feature_names))
+
+def _top_terms(scores: np.ndarray, feature_names, count: int, keep: np.ndarray) -> List[Tuple[str, float]]:
+    """
+    Pick the highest-scoring terms flagged in ``keep`` without sorting the whole vocabulary.
+    
+    Terms come in descending score order with ties in vocabulary order, as a
+    stable sort would give. Only kept terms scoring at least the k-th best
+    are sorted.
+    """
+    candidates = np.flatnonzero(keep)
+    if len(candidates) > count:
+        kept = scores[candidates]
+        threshold = np.partition(kept, len(kept) - count)[len(kept) - count]
+        candidates = candidates[kept >= threshold]
+    
+    order = candidates[np.lexsort((candidates, -scores[candidates]))][:count]
+    return [(feature_names[i], float(scores[i])) for i in order]
+
+# Languages langdetect chooses between; chats are mostly Chinese and English,
+# and leaving out the other profiles keeps their n-gram tables out of memory
+DETECTION_LANGUAGES = (
+    'en', 'zh-cn', 'zh-tw', 'ja', 'ko', 'ru', 'es', 'fr',
+    'de', 'pt', 'it', 'ar', 'hi', 'id', 'tr',
+)
+
+# Language profiles, loaded once per process (see _get_detector_factory)
+_detector_factory = None
+
+def _get_detector_factory() -> DetectorFactory:
+    """Get the shared langdetect factory, loading its profiles on first use."""
+    global _detector_factory
+    if _detector_factory is None:
+        profiles = []
+        for lang in DETECTION_LANGUAGES:
+            with open(os.path.join(PROFILES_DIRECTORY, lang), 'r', encoding='utf-8') as f:
+                profiles.append(f.read())
+        
+        factory = DetectorFactory()
+        factory.load_json_profile(profiles)
+        factory.set_seed(0)  # langdetect is randomized; a fixed seed makes results repeatable
+        _detector_factory = factory
+    return _detector_factory
+
+def _detect(text: str) -> str:
+    """Detect the language of a text."""
+    try:
+        detector = _get_detector_factory().create()
+        detector.append(text)
+        return detector.detect()
+    except Exception:
+        return 'unknown'
+
+# Results for repeated texts are remembered; the cache holds its keys, so it
+# only takes texts up to DETECTION_CACHE_TEXT_LENGTH characters
+_detect_cached = lru_cache(maxsize=4096)(_detect)
+
 class NLPProcessor:
     """Service for NLP tasks like topic extraction and sentiment analysis."""
     
@@ -24,23 +139,34 @@ class NLPProcessor:
         # Configure stopwords for different languages
         try:
             self.stopwords = {
-                'en': set(nltk.corpus.stopwords.words('english')),
+                'en': frozenset(nltk.corpus.stopwords.words('english')),
                 'zh': self._load_chinese_stopwords(),
                 'zh-tw': self._load_chinese_stopwords(),  # Traditional Chinese
-                'default': set()
+                'default': frozenset()
             }
         except Exception as e:
             logger.warning(f"Unable to load NLTK stopwords: {e}. Using empty stopwords.")
             self.stopwords = {
-                'en': set(),
+                'en': frozenset(),
                 'zh': self._load_chinese_stopwords(),
                 'zh-tw': self._load_chinese_stopwords(),
-                'default': set()
+                'default': frozenset()
             }
         
-        # Regex patterns
-        self.url_pattern = re.compile(r'https?://\S+|www\.\S+')
-        self.emoji_pattern = re.compile(r':[a-zA-Z0-9_]+:')
+        # VADER analyzer, created on first English sentiment analysis
+        self._sia = None
+        
+        # (vectorizer, feature names) fitted by fit_corpus, if any
+        self._corpus = None
+        
+        # Very small positive/negative Chinese lexicon for non-English sentiment
+        # In production, use comprehensive lexicons
+        self._pos_words = frozenset({'好', '喜欢', '爱', '棒', '优秀', '开心', '快乐', '美', '赞', '佳'})
+        self._neg_words = frozenset({'坏', '差', '烂', '讨厌', '恨', '悲伤', '痛苦', '丑', '糟', '恶心'})
+        
+        # Regex patterns (compiled once at module level)
+        self.url_pattern = URL_PATTERN
+        self.emoji_pattern = EMOJI_PATTERN
         
     def _load_resources(self):
         """Load necessary NLP resources."""
@@ -53,19 +179,22 @@ class NLPProcessor:
             # For Chinese text processing
             jieba.initialize()
             
+            # Language profiles, so the first detection does not pay for loading them
+            _get_detector_factory()
+            
         except Exception as e:
             logger.error(f"Error loading NLP resources: {e}")
     
-    def _load_chinese_stopwords(self) -> set:
+    def _load_chinese_stopwords(self) -> frozenset:
         """Load Chinese stopwords."""
         # A small set of common Chinese stopwords
         # In a production system, you'd load from a comprehensive file
-        return {
+        return frozenset({
             '的', '了', '和', '是', '就', '都', '而', '及', '與', '著',
             '或', '一個', '沒有', '我們', '你們', '他們', '她們', '自己',
             '這', '那', '這個', '那個', '這些', '那些', '這樣', '那樣',
             '不', '沒', '不是', '不能', '不要', '不會',
-        }
+        })
     
     def detect_language(self, text: str) -> str:
         """Detect the language of a text."""
@@ -73,7 +202,7 @@ class NLPProcessor:
             if not text or len(text.strip()) < 5:
                 return 'unknown'
             
-            return detect(text)
+            return _detect_cached(text) if len(text) <= DETECTION_CACHE_TEXT_LENGTH else _detect(text)
         except:
             return 'unknown'
     
@@ -81,44 +210,84 @@ class NLPProcessor:
         """Clean and preprocess text for analysis."""
         if not text:
             return ""
+        return self._normalize_case(self._strip_markup(text).translate(_PUNCT_TABLE))
+    
+    @staticmethod
+    def _normalize_case(text: str) -> str:
+        """Lowercase text unless it is Chinese, found by a scan for CJK ideographs rather than language detection."""
+        return text if _HAS_CJK.search(text) else text.lower()
+    
+    def _strip_markup(self, text: str) -> str:
+        """Remove URLs and emoji shortcodes from text."""
+        # Remove URLs; most messages have none, so skip the regex when it cannot match
+        if 'http' in text or 'www.' in text:
+            text = self.url_pattern.sub('', text)
         
-        # Remove URLs
-        text = self.url_pattern.sub('', text)
+        # Remove emojis (":shortcode:" needs a colon)
+        if ':' in text:
+            text = self.emoji_pattern.sub('', text)
+        return text
+    
+    def _strip_markup_batch(self, texts: List[str]) -> List[str]:
+        """Remove URLs and emoji shortcodes from many texts with one scan per pattern."""
+        if not texts:
+            return []
+        if any(TEXT_SEPARATOR in t for t in texts):
+            return [self._strip_markup(t) for t in texts]
+        return self._strip_markup(TEXT_SEPARATOR.join(texts)).split(TEXT_SEPARATOR)
+    
+    def _preprocess_with_language(self, text: str, strip_markup: bool = True) -> Tuple[str, str]:
+        """
+        Preprocess text and also return the language detected along the way.
         
-        # Remove emojis
-        text = self.emoji_pattern.sub('', text)
+        Args:
+            text: The text to preprocess
+            strip_markup: Remove URLs and emoji shortcodes; callers that already
+                did so in a batch pass False
+        """
+        if not text:
+            return "", 'unknown'
+        
+        if strip_markup:
+            text = self._strip_markup(text)
         
         # Remove punctuation
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        text = text.translate(_PUNCT_TABLE)
         
-        # Convert to lowercase for non-Chinese text
+        # The language is detected before lowercasing non-Chinese text
         lang = self.detect_language(text)
-        if lang not in ['zh', 'zh-tw']:
-            text = text.lower()
-        
-        return text
+        return self._normalize_case(text), lang
     
-    def tokenize(self, text: str) -> List[str]:
-        """Tokenize text based on detected language."""
-        text = self.preprocess_text(text)
+    def tokenize(self, text: str, lang: Optional[str] = None) -> List[str]:
+        """
+        Tokenize text based on detected language.
+        
+        Args:
+            text: The text to tokenize
+            lang: Language of the text if the caller already detected it;
+                otherwise the one detected while preprocessing is used
+        """
+        if lang:
+            text = self.preprocess_text(text)
+        else:
+            text, lang = self._preprocess_with_language(text)
         if not text:
             return []
         
-        lang = self.detect_language(text)
-        
         if lang in ['zh', 'zh-tw']:
             # Chinese tokenization
             return list(jieba.cut(text))
         else:
             # Default to English/other languages
-            return nltk.word_tokenize(text)
+            return _TOKEN_RE.findall(text)
     
-    def extract_topics(self, text: str, num_topics: int = 5, num_words: int = 5) -> List[Tuple[str, float]]:
+    def extract_topics(self, text: Union[str, Iterable[str]], num_topics: int = 5, num_words: int = 5) -> List[Tuple[str, float]]:
         """
-        Extract main topics from text using LDA topic modeling.
+        Extract main topics from text as its highest-weighted TF-IDF terms.
         
         Args:
-            text: The text to analyze
+            text: The text to analyze, or an iterable of texts (e.g. messages)
+                that are used as separate documents without being joined
             num_topics: Number of topics to extract
             num_words: Number of words per topic
             
@@ -126,34 +295,50 @@ class NLPProcessor:
             List of (topic, weight) tuples
         """
         try:
-            if not text or len(text.strip()) < 100:  # Require more text for LDA
-                return []
-            
-            # Preprocess
-            processed_text = self.preprocess_text(text)
-            lang = self.detect_language(processed_text)
+            if isinstance(text, str):
+                if not text or len(text.strip()) < 100:  # Require more text for LDA
+                    return []
+                
+                # Preprocess; the language comes from the same pass
+                processed_text, lang = self._preprocess_with_language(text)
+                
+                # Chinese text is segmented by the vectorizer's tokenizer
+                if lang in ['zh', 'zh-tw']:
+                    docs = [processed_text]
+                else:
+                    # Tokenize and create documents; markup and punctuation are
+                    # already gone, so sentences only need their case settled
+                    sentences = nltk.sent_tokenize(processed_text)
+                    docs = [self._normalize_case(sent) for sent in sentences if len(sent.strip()) > 20]
+                    
+                    if not docs:
+                        docs = [processed_text]
+            else:
+                # Each text is its own document, however short (most chat
+                # messages are); only the corpus as a whole needs enough text
+                texts = self._strip_markup_batch([t for t in text if t])
+                docs = [t.translate(_PUNCT_TABLE) for t in texts]
+                docs = [doc for doc in docs if doc.strip()]
+                if sum(len(doc) for doc in docs) < 100:  # Require more text for LDA
+                    return []
+                
+                # The corpus language is detected once, on a sample of the
+                # documents joined, before their case is normalized
+                lang = self.detect_language(" ".join(docs)[:LANGUAGE_SAMPLE_LENGTH])
+                docs = [self._normalize_case(doc) for doc in docs]
             
             # Get stopwords for detected language
             stop_words = self.stopwords.get(lang, self.stopwords['default'])
-            
-            # For Chinese text, use jieba to tokenize first
-            if lang in ['zh', 'zh-tw']:
-                tokens = list(jieba.cut(processed_text))
-                docs = [' '.join(tokens)]
-            else:
-                # Tokenize and create documents
-                sentences = nltk.sent_tokenize(processed_text)
-                docs = [self.preprocess_text(sent) for sent in sentences if len(sent.strip()) > 20]
-                
-                if not docs:
-                    docs = [processed_text]
+            is_chinese = lang in ['zh', 'zh-tw']
             
             # Create document-term matrix
             count_vectorizer = CountVectorizer(
                 max_df=0.95, 
                 min_df=1,  # Change min_df from 2 to 1 to avoid the error
                 max_features=1000,
-                stop_words=stop_words if lang == 'en' else None
+                stop_words=sorted(stop_words) if lang == 'en' else None,  # sklearn takes a list, not a set
+                tokenizer=_chinese_words if is_chinese else None,
+                token_pattern=None if is_chinese else r"(?u)\b\w\w+\b"
             )
             
             try:
@@ -161,77 +346,185 @@ class NLPProcessor:
                 dtm = count_vectorizer.fit_transform(docs)
                 feature_names = count_vectorizer.get_feature_names_out()
                 
-                if dtm.shape[0] < 3 or dtm.shape[1] < 10:
-                    # Not enough data for meaningful LDA
-                    # Fall back to TF-IDF based extraction
-                    tfidf_vectorizer = TfidfVectorizer(
-                        max_df=0.95, 
-                        min_df=1,  # Ensure min_df is 1 to avoid errors with small document sets
-                        max_features=1000,
-                        stop_words=stop_words if lang == 'en' else None
-                    )
-                    
-                    tfidf_matrix = tfidf_vectorizer.fit_transform(docs)
-                    feature_names = tfidf_vectorizer.get_feature_names_out()
-                    
-                    # Get term importance scores
-                    tfidf_scores = zip(feature_names, tfidf_matrix.sum(axis=0).tolist()[0])
-                    top_words = sorted(tfidf_scores, key=lambda x: x[1], reverse=True)
-                    
-                    # Filter out stopwords and single-character words
-                    filtered_words = [(word, score) for word, score in top_words 
-                                    if word not in stop_words and len(word) > 1]
-                    
-                    # Try to group related terms for more meaningful topics
-                    topics = []
-                    for i in range(min(num_topics, len(filtered_words))):
-                        if i < len(filtered_words):
-                            word, score = filtered_words[i]
-                            topics.append((word, float(score)))
-                    
-                    return topics[:num_topics]
-                
-                # Apply LDA with proper error handling
-                n_components = min(num_topics, min(dtm.shape[0], dtm.shape[1])-1)
-                if n_components < 1:
-                    # If we can't create a valid LDA model, return simple word-based topics
-                    top_indices = np.argsort(dtm.sum(axis=0).A1)[-num_topics:]
-                    return [(feature_names[i], 1.0/(j+1)) for j, i in enumerate(top_indices)]
+                # TF-IDF based extraction, weighting the counts already
+                # computed instead of building the vocabulary again; LDA is
+                # left to extract_topics_lda, as it needs a real corpus
+                tfidf_matrix = TfidfTransformer().fit_transform(dtm)
                 
-                lda = LatentDirichletAllocation(
-                    n_components=n_components,
-                    random_state=42,
-                    learning_method='online'
-                )
-                
-                lda.fit(dtm)
-                
-                # Format LDA topics
-                topics = []
-                for topic_idx, topic in enumerate(lda.components_):
-                    # Get top words for this topic
-                    top_indices = topic.argsort()[:-num_words-1:-1]
-                    top_words = [feature_names[i] for i in top_indices 
-                                if feature_names[i] not in stop_words and len(feature_names[i]) > 1]
+                # Get term importance scores, keeping the best terms that are
+                # not stopwords or single characters
+                tfidf_scores = _column_totals(tfidf_matrix)
+                return _top_terms(tfidf_scores, feature_names, num_topics,
+                                  _term_mask(feature_names, stop_words))
                 
             except Exception as e:
                 logger.warning(f"Advanced topic extraction failed: {e}")
-                # Fallback to a simpler approach
-                word_counts = Counter()
-                for doc in docs:
-                    words = doc.split()
-                    word_counts.update(words)
-                
-                # Filter out stopwords and get top words
-                top_words = [(word, count) for word, count in word_counts.most_common(num_topics*num_words)
-                            if word not in stop_words and len(word) > 1]
+                # Fallback to a simpler approach, counting words with numpy;
+                # words are the vectorizer's terms without stopwords, so
+                # whitespace and punctuation segments never take a slot
+                words = np.array([word for doc in docs
+                                  for word in (_chinese_words(doc) if is_chinese else _WORD_PATTERN.findall(doc))
+                                  if word not in stop_words])
+                if not words.size:
+                    return []
+                uniq, first, counts = np.unique(words, return_index=True, return_counts=True)
                 
-                return top_words[:num_topics]
+                # Most common first with ties in order of first appearance,
+                # like Counter.most_common
+                order = np.lexsort((first, -counts))[:num_topics]
+                return [(str(uniq[i]), int(counts[i])) for i in order]
                 
         except Exception as e:
             logger.error(f"Error extracting topics: {e}")
             return []
     
+    def extract_topics_lda(self, docs: List[str], num_topics: int = 5, num_words: int = 5) -> List[Tuple[str, float]]:
+        """
+        Extract topics from a corpus of documents using LDA topic modeling.
+        
+        LDA only makes sense over many documents, so extract_topics does not
+        use it; call this explicitly with e.g. one document per user or day.
+        
+        Args:
+            docs: The documents of the corpus
+            num_topics: Number of topics to extract
+            num_words: Number of words per topic
+            
+        Returns:
+            List of (topic, weight) tuples, where a topic is its top words
+            joined by spaces and weight is its share of the corpus
+        """
+        try:
+            token_docs = [doc for doc in self._topic_documents(docs) if doc]
+            if len(token_docs) < 3:
+                return []
+            
+            # Documents are already tokenized, so the analyzer passes them through
+            count_vectorizer = CountVectorizer(analyzer=lambda tokens: tokens, max_df=0.95, min_df=1, max_features=1000)
+            dtm = count_vectorizer.fit_transform(token_docs)
+            feature_names = count_vectorizer.get_feature_names_out()
+            
+            n_components = min(num_topics, min(dtm.shape) - 1)
+            if n_components < 1:
+                return []
+            
+            lda = LatentDirichletAllocation(
+                n_components=n_components,
+                random_state=42,
+                learning_method='online'
+            )
+            lda.fit(dtm)
+            
+            # Format LDA topics
+            totals = lda.components_.sum(axis=1)
+            topics = []
+            for topic, total in zip(lda.components_, totals):
+                top_indices = np.argsort(-topic, kind='stable')[:num_words]
+                topics.append((' '.join(feature_names[i] for i in top_indices), float(total / totals.sum())))
+            return topics
+        except Exception as e:
+            logger.error(f"Error extracting LDA topics: {e}")
+            return []
+    
+    def _topic_documents(self, texts: List[str]) -> List[List[str]]:
+        """Turn texts into token lists for TF-IDF, without stopwords; Chinese is segmented with jieba."""
+        docs = []
+        for text in self._strip_markup_batch(list(texts)):
+            doc, lang = self._preprocess_with_language(text, strip_markup=False)
+            tokens = jieba.lcut(doc) if lang in ['zh', 'zh-tw'] else _WORD_PATTERN.findall(doc)
+            stop_words = self.stopwords.get(lang, self.stopwords['default'])
+            docs.append([t for t in tokens if len(t) > 1 and t not in stop_words and not t.isspace()])
+        return docs
+    
+    @staticmethod
+    def _topic_vectorizer(num_docs: int) -> TfidfVectorizer:
+        """Create the TF-IDF vectorizer for token lists built by _topic_documents."""
+        # Documents are already tokenized, so the analyzer passes them through
+        return TfidfVectorizer(
+            analyzer=lambda tokens: tokens,
+            max_df=0.95 if num_docs > 1 else 1.0,
+            min_df=1,
+            max_features=10000
+        )
+    
+    def fit_corpus(self, texts: List[str]) -> bool:
+        """
+        Learn the TF-IDF vocabulary and weights of a whole chat once.
+        
+        Later extract_topics_batch calls only transform their texts against
+        this corpus instead of fitting a vectorizer per call, which suits
+        analyzing many slices (e.g. users) of the same chat.
+        
+        Args:
+            texts: The corpus texts, e.g. every message of the chat
+            
+        Returns:
+            True if a corpus was fitted, False if the texts had no usable terms
+            (any earlier corpus is then dropped, as it belongs to other texts)
+        """
+        try:
+            docs = self._topic_documents(texts)
+            if not any(docs):
+                self._corpus = None
+                return False
+            
+            vectorizer = self._topic_vectorizer(len(docs))
+            vectorizer.fit(docs)
+            self._corpus = (vectorizer, vectorizer.get_feature_names_out())
+            return True
+        except Exception as e:
+            logger.error(f"Error fitting topic corpus: {e}")
+            self._corpus = None
+            return False
+    
+    def extract_topics_batch(self, texts: List[str], num_topics: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Extract the top terms of many texts with a single TF-IDF fit.
+        
+        All texts are vectorized together, so term weights reflect the whole
+        batch instead of one document each, and top terms are read from the
+        sparse rows directly. After fit_corpus, the texts are weighted against
+        the fitted corpus instead, and terms outside its vocabulary are ignored.
+        
+        Args:
+            texts: The texts to analyze, e.g. one per user
+            num_topics: Number of terms to return per text
+            
+        Returns:
+            List of (term, weight) lists, one per input text (empty for texts
+            without usable terms)
+        """
+        try:
+            docs = self._topic_documents(texts)
+            if not any(docs):
+                return [[] for _ in docs]
+            
+            corpus = self._corpus
+            if corpus is not None:
+                vectorizer, feature_names = corpus
+                matrix = vectorizer.transform(docs).tocsr()
+            else:
+                vectorizer = self._topic_vectorizer(len(docs))
+                matrix = vectorizer.fit_transform(docs).tocsr()
+                feature_names = vectorizer.get_feature_names_out()
+            
+            results = []
+            for row in range(matrix.shape[0]):
+                start, end = matrix.indptr[row], matrix.indptr[row + 1]
+                scores = matrix.data[start:end]
+                terms = matrix.indices[start:end]
+                if len(scores) > num_topics:
+                    top = np.argpartition(-scores, num_topics - 1)[:num_topics]
+                    scores, terms = scores[top], terms[top]
+                
+                # Highest weight first; equal weights in vocabulary order
+                order = np.lexsort((terms, -scores))
+                results.append([(feature_names[terms[i]], float(scores[i])) for i in order])
+            return results
+        except Exception as e:
+            logger.error(f"Error extracting topics in batch: {e}")
+            return [[] for _ in texts]
+    
     def analyze_sentiment(self, text: str) -> Dict[str, float]:
         """
         Analyze sentiment of the text.
@@ -246,13 +539,24 @@ class NLPProcessor:
             if not text:
                 return {"positive": 0.0, "negative": 0.0, "neutral": 1.0}
             
-            lang = self.detect_language(text)
+            # Most chat messages are a few characters long; those are never
+            # detected as English, and without CJK characters they cannot
+            # contain a lexicon word either
+            has_cjk = _HAS_CJK.search(text) is not None
+            if len(text.strip()) < 5:
+                if not has_cjk:
+                    return {"positive": 0.1, "negative": 0.1, "neutral": 0.8}
+                lang = 'unknown'
+            else:
+                lang = self.detect_language(text)
             
             # For English text, use VADER
             if lang == 'en':
-                from nltk.sentiment import SentimentIntensityAnalyzer
-                sia = SentimentIntensityAnalyzer()
-                sentiment = sia.polarity_scores(text)
+                # Loading the VADER lexicon is expensive, so the analyzer is reused
+                if self._sia is None:
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    self._sia = SentimentIntensityAnalyzer()
+                sentiment = self._sia.polarity_scores(text)
                 
                 return {
                     "positive": sentiment['pos'],
@@ -264,15 +568,13 @@ class NLPProcessor:
                 # Count positive and negative words based on a small lexicon
                 # This is just a placeholder - in a real system, you would use
                 # language-specific sentiment analysis tools
+                if not has_cjk:
+                    return {"positive": 0.1, "negative": 0.1, "neutral": 0.8}
                 
-                # Very small positive/negative Chinese lexicon
-                # In production, use comprehensive lexicons
-                pos_words = {'好', '喜欢', '爱', '棒', '优秀', '开心', '快乐', '美', '赞', '佳'}
-                neg_words = {'坏', '差', '烂', '讨厌', '恨', '悲伤', '痛苦', '丑', '糟', '恶心'}
-                
-                tokens = self.tokenize(text)
-                pos_count = sum(1 for t in tokens if t in pos_words)
-                neg_count = sum(1 for t in tokens if t in neg_words)
+                # Count tokens once, then look up only the lexicon words
+                counts = Counter(self.tokenize(text, lang))
+                pos_count = sum(counts[w] for w in self._pos_words)
+                neg_count = sum(counts[w] for w in self._neg_words)
                 total = pos_count + neg_count
                 
                 if total == 0:
@@ -290,4 +592,28 @@ class NLPProcessor:
                 
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {e}")
-            return {"positive": 0.0, "negative": 0.0, "neutral": 1.0} 
\ No newline at end of file
+            return {"positive": 0.0, "negative": 0.0, "neutral": 1.0} 
+    
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """
+        Analyze the sentiment of many texts, e.g. individual messages.
+        
+        Repeated texts are scored once, and distinct texts are spread over a
+        thread pool when more than one CPU is available.
+        
+        Args:
+            texts: The texts to analyze
+            
+        Returns:
+            Sentiment score dictionaries in the same order as the texts
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        workers = min(os.cpu_count() or 1, len(unique_texts))
+        if workers < 2:
+            scores = [self.analyze_sentiment(text) for text in unique_texts]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                scores = list(pool.map(self.analyze_sentiment, unique_texts))
+        
+        by_text = dict(zip(unique_texts, scores))
+        return [dict(by_text[text]) for text in texts]
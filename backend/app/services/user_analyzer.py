@@ -1,20 +1,236 @@
-import re
 import logging
-from typing import Dict, List, Any, Optional, Set
-from collections import Counter, defaultdict
+from typing import Dict, List, Any, Optional, Set, Tuple
+from collections import OrderedDict
 from datetime import datetime
-import emoji
 import os
 import time
-import json
+import atexit
+import threading
+import sqlite3
+import orjson
+import numpy as np
+import pandas as pd
 
 # Import custom modules
 from app.models.chat_models import UserProfile, Message
 from app.services.chat_parser import ChatParser
 from app.services.nlp_service import NLPProcessor
+from app.utils.text_helpers import text_stats
+from app.utils.aggregation import HAVE_NUMBA, aggregate_by_user, bincount_by_user, bin_by_user, bincount_bins_by_user
 
 logger = logging.getLogger(__name__)
 
+# Most message texts kept per profile; sentiment and topic analysis only
+# look at the first ones
+PROFILE_TEXT_LIMIT = 200
+
+# Texts (of those kept) that sentiment analysis reads, to avoid overload
+SENTIMENT_TEXT_LIMIT = 100
+
+# Below this many distinct texts or characters in them, a profile skips
+# sentiment and topic analysis
+NLP_MIN_TEXTS = 5
+NLP_MIN_TEXT_LENGTH = 50
+
+# Cache entries kept in memory in front of the cache files
+MEMORY_CACHE_SIZE = 1024
+
+# Seconds to collect cache writes before they are flushed to disk together
+CACHE_FLUSH_DELAY = 5.0
+
+def _parse_dates(dates: List[str]) -> Tuple[np.ndarray, Optional[List[Optional[datetime]]]]:
+    """
+    Parse ISO message dates into a datetime64[s] array, with NaT for missing dates.
+    
+    Returns:
+        The parsed dates, plus the datetime objects when some dates needed
+        datetime.fromisoformat (fractions, offsets), else None
+    """
+    # Export dates are plain YYYY-MM-DDTHH:MM:SS and numpy parses them in one call
+    try:
+        if max(map(len, dates)) <= 19:
+            return np.array(dates, dtype='datetime64[s]'), None
+    except ValueError:
+        pass
+    
+    parsed = []
+    for date in dates:
+        try:
+            parsed.append(datetime.fromisoformat(date) if date else None)
+        except ValueError:
+            parsed.append(None)
+    values = np.array([d.replace(tzinfo=None) if d else None for d in parsed], dtype='datetime64[s]')
+    return values, parsed
+
+def _profile_from_cache(data: Dict[str, Any]) -> UserProfile:
+    """
+    Rebuild a cached profile without running validation again.
+    
+    The cache only holds profiles that were validated when they were built;
+    only the hour and weekday keys need converting back from JSON strings.
+    """
+    for field in ('active_hours', 'active_weekdays'):
+        if field in data:
+            data[field] = {int(key): count for key, count in data[field].items()}
+    return UserProfile.model_construct(**data)
+
+class _UserStats:
+    """Final statistics of one user's messages."""
+    
+    # One instance per user; slots skip the per-instance __dict__
+    __slots__ = ('name', 'message_count', 'first_date', 'last_date', 'active_days',
+                 'hours_count', 'weekdays_count', 'avg_length', 'emoji_count',
+                 'media_count', 'link_count', 'forwarded_count', 'all_text')
+    
+    def __init__(self, name: Optional[str]):
+        """
+        Start empty statistics.
+        
+        Args:
+            name: Display name from the user's first message
+        """
+        self.name = name
+        self.message_count = 0
+        self.first_date = None
+        self.last_date = None
+        self.active_days = 0
+        self.hours_count = {}
+        self.weekdays_count = {}
+        self.avg_length = 0
+        self.emoji_count = 0
+        self.media_count = {}
+        self.link_count = 0
+        self.forwarded_count = 0
+        self.all_text = []
+
+def _aggregate_messages(messages) -> Dict[str, _UserStats]:
+    """
+    Compute every user's statistics from columns of their messages.
+    
+    The loop only flattens each message into a row of columns keyed by a user
+    code; totals and hour/weekday counts are then reduced per code by the
+    aggregation kernels, date ranges and media types with pandas group-bys.
+    Dicts of counts keep their keys in first-seen order.
+    
+    Args:
+        messages: Message objects, or None for messages that failed to parse
+    
+    Returns:
+        Statistics by user ID, in order of each user's first message
+    """
+    stats = []
+    codes = {}
+    user_col, date_col, forwarded_col = [], [], []
+    text_col, length_col, emoji_col, link_col = [], [], [], []
+    media_users, media_types = [], []
+    
+    for msg in messages:
+        if msg is None or not msg.from_id:
+            continue
+        code = codes.get(msg.from_id)
+        if code is None:
+            code = codes[msg.from_id] = len(stats)
+            stats.append(_UserStats(msg.from_name))
+        
+        user_col.append(code)
+        date_col.append(msg.date or '')
+        forwarded_col.append(bool(msg.forwarded_from))
+        
+        # Photos go with the media types so keys keep first-seen order
+        if msg.media_type:
+            media_users.append(code)
+            media_types.append(msg.media_type)
+        if msg.photo:
+            media_users.append(code)
+            media_types.append('photo')
+        
+        if not isinstance(msg.text, (str, list)):
+            text_col.append(False)
+            length_col.append(0)
+            emoji_col.append(0)
+            link_col.append(0)
+            continue
+        text_content, emojis, links = text_stats(msg.text)
+        text_col.append(True)
+        length_col.append(len(text_content))
+        emoji_col.append(emojis)
+        link_col.append(links)
+        all_text = stats[code].all_text
+        if len(all_text) < PROFILE_TEXT_LIMIT:
+            all_text.append(text_content)
+    
+    if not stats:
+        return {}
+    
+    # Per-user totals from the Numba kernel (NumPy bincounts without Numba)
+    n_users = len(stats)
+    users = np.array(user_col, dtype=np.int64)
+    metrics = np.array([text_col, length_col, emoji_col, link_col, forwarded_col], dtype=np.int64)
+    aggregate = aggregate_by_user if HAVE_NUMBA else bincount_by_user
+    (text_counts, total_lengths, emoji_counts, link_counts, forwarded_counts), _ = aggregate(users, metrics, n_users)
+    message_counts = np.bincount(users, minlength=n_users)
+    for code, user in enumerate(stats):
+        user.message_count = int(message_counts[code])
+        user.emoji_count = int(emoji_counts[code])
+        user.link_count = int(link_counts[code])
+        user.forwarded_count = int(forwarded_counts[code])
+        user.avg_length = int(total_lengths[code]) / int(text_counts[code]) if text_counts[code] else 0
+    
+    # Date range, active days and activity patterns by hour and weekday
+    values, parsed = _parse_dates(date_col)
+    dated = ~np.isnat(values)
+    if dated.any():
+        values = values[dated]
+        days = values.astype('datetime64[D]')
+        day_numbers = days.astype(np.int64)
+        dates = pd.DataFrame({
+            'user': users[dated],
+            'seconds': values.astype(np.int64),
+            'day': day_numbers,
+            'hour': (values - days) // np.timedelta64(1, 'h'),
+            'weekday': (day_numbers + 3) % 7,  # 1970-01-01 was a Thursday
+        })
+        by_user = dates.groupby('user')
+        active_days = by_user['day'].nunique()
+        for code, days_active in zip(active_days.index.tolist(), active_days.tolist()):
+            stats[code].active_days = days_active
+        
+        if parsed is None:
+            first = by_user['seconds'].min()
+            last = by_user['seconds'].max()
+            for code, first_seconds, last_seconds in zip(first.index.tolist(), first.tolist(), last.tolist()):
+                stats[code].first_date = np.datetime64(first_seconds, 's').item().isoformat()
+                stats[code].last_date = np.datetime64(last_seconds, 's').item().isoformat()
+        else:
+            # The range keeps the offsets and fractions of the original dates
+            ranges = {}
+            for code, date in zip(user_col, parsed):
+                if date is None:
+                    continue
+                bounds = ranges.get(code)
+                ranges[code] = (date, date) if bounds is None else (min(bounds[0], date), max(bounds[1], date))
+            for code, (first_date, last_date) in ranges.items():
+                stats[code].first_date = first_date.isoformat()
+                stats[code].last_date = last_date.isoformat()
+        
+        # Hour and weekday counts, with each user's keys in first-seen order
+        dated_users = users[dated]
+        bin_counts = bin_by_user if HAVE_NUMBA else bincount_bins_by_user
+        for column, size, attribute in (('hour', 24, 'hours_count'), ('weekday', 7, 'weekdays_count')):
+            counts, first_seen = bin_counts(dated_users, dates[column].to_numpy(), n_users, size)
+            codes_seen, bins_seen = np.nonzero(counts)
+            order = np.lexsort((first_seen[codes_seen, bins_seen], codes_seen))
+            for code, value, count in zip(codes_seen[order].tolist(), bins_seen[order].tolist(),
+                                          counts[codes_seen, bins_seen][order].tolist()):
+                getattr(stats[code], attribute)[value] = count
+    
+    if media_users:
+        media = pd.DataFrame({'user': np.array(media_users, dtype=np.int32), 'type': media_types})
+        for (code, media_type), count in media.groupby(['user', 'type'], sort=False).size().items():
+            stats[code].media_count[media_type] = int(count)
+    
+    return {user_id: stats[code] for user_id, code in codes.items()}
+
 class UserAnalyzer:
     """Service for analyzing user profiles from chat data."""
     
@@ -28,12 +244,34 @@ class UserAnalyzer:
         """
         self.chat_parser = chat_parser
         self.nlp_processor = nlp_processor or NLPProcessor()
-        self.url_pattern = re.compile(r'https?://\S+|www\.\S+')
-        self.emoji_pattern = re.compile(r':[a-zA-Z0-9_]+:')
         self.cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache")
         self._ensure_cache_dir()
         self.cache_ttl = 3600  # Cache validity in seconds (1 hour)
         
+        # All entries live in one SQLite database keyed by cache key, so a lookup
+        # is one indexed query instead of a stat and open of a file per user
+        self.cache_path = os.path.join(self.cache_dir, "user_cache.sqlite3")
+        self._db = self._open_cache_db()
+        self._db_lock = threading.Lock()
+        
+        # Recently used cache entries as key -> (time stored, data), least
+        # recently used first, so hot profiles skip the database and JSON decoding
+        self._memory_cache = OrderedDict()
+        self._memory_lock = threading.Lock()
+        
+        # Cache writes are held here as key -> (time stored, data) and flushed in
+        # one transaction shortly after, so warming many profiles does not write
+        # on the request thread
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._flush_timer = None
+        atexit.register(self._flush_cache)
+        
+        # Per-user statistics from one pass over the chat (see _get_aggregates)
+        self._aggregates = None
+        self._aggregates_version = None
+        self._aggregates_lock = threading.Lock()
+        
     def _ensure_cache_dir(self):
         """Create cache directory if it doesn't exist."""
         if not os.path.exists(self.cache_dir):
@@ -43,61 +281,158 @@ class UserAnalyzer:
             except Exception as e:
                 logger.error(f"Failed to create cache directory: {e}")
                 
-    def _get_cache_path(self, key):
-        """Get the cache file path for a given key."""
-        return os.path.join(self.cache_dir, f"{key}.json")
+    def _open_cache_db(self) -> Optional[sqlite3.Connection]:
+        """Open the cache database, dropping expired entries; None if it cannot be opened."""
+        try:
+            db = sqlite3.connect(self.cache_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored_at REAL, data BLOB)")
+            with db:
+                db.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.cache_ttl,))
+            return db
+        except Exception as e:
+            logger.error(f"Failed to open cache database: {e}")
+            return None
     
-    def _cache_is_valid(self, cache_path):
-        """Check if cache exists and is not expired."""
-        if not os.path.exists(cache_path):
-            return False
-        
-        # Check if cache file is newer than TTL
-        file_age = time.time() - os.path.getmtime(cache_path)
-        return file_age < self.cache_ttl
+    def _memory_get(self, key):
+        """Get an unexpired entry from the in-memory cache, or None."""
+        with self._memory_lock:
+            entry = self._memory_cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.cache_ttl:
+                del self._memory_cache[key]
+                return None
+            self._memory_cache.move_to_end(key)
+            return entry[1]
+    
+    def _memory_put(self, key, data, stored_at=None):
+        """Add an entry to the in-memory cache, evicting the least recently used."""
+        with self._memory_lock:
+            self._memory_cache[key] = (time.time() if stored_at is None else stored_at, data)
+            self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > MEMORY_CACHE_SIZE:
+                self._memory_cache.popitem(last=False)
     
     def _read_from_cache(self, key):
         """Try to read data from cache."""
-        cache_path = self._get_cache_path(key)
+        data = self._memory_get(key)
+        if data is not None:
+            return data
         
-        if self._cache_is_valid(cache_path):
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    logger.info(f"Loading user profile from cache: {cache_path}")
-                    data = json.load(f)
-                    
-                    # Handle different cache types
-                    if key == "user_list":
-                        return data  # Return list directly
-                    else:
-                        # Convert the JSON data back to UserProfile object
-                        return UserProfile(**data)
-            except Exception as e:
-                logger.error(f"Error reading from cache: {e}")
+        # Entries waiting to be flushed are newer than anything on disk
+        with self._dirty_lock:
+            pending = self._dirty.get(key)
+        if pending is not None:
+            return pending[1]
+        
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT stored_at, data FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[0] >= self.cache_ttl:
+                return None
+            
+            logger.info(f"Loading user profile from cache: {key}")
+            data = orjson.loads(row[1])
+            
+            # Handle different cache types
+            if not key.startswith("user_list"):
+                # Convert the JSON data back to UserProfile object
+                data = _profile_from_cache(data)
+            
+            # The entry's original store time still decides when it expires
+            self._memory_put(key, data, row[0])
+            return data
+        except Exception as e:
+            logger.error(f"Error reading from cache: {e}")
                 
         return None
     
     def _write_to_cache(self, key, data):
-        """Write data to cache."""
-        cache_path = self._get_cache_path(key)
+        """Queue data for the next cache flush."""
+        stored_at = time.time()
+        self._memory_put(key, data, stored_at)
         
+        with self._dirty_lock:
+            self._dirty[key] = (stored_at, data)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(CACHE_FLUSH_DELAY, self._flush_cache)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _flush_cache(self):
+        """Write every queued cache entry to the database in one transaction."""
+        with self._dirty_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty or self._db is None:
+                self._dirty.clear()
+                return
+            
+            rows = []
+            for key, (stored_at, data) in self._dirty.items():
+                try:
+                    # Ensure data is serializable by converting to dict
+                    if isinstance(data, UserProfile):
+                        data_dict = data.model_dump()
+                    else:
+                        data_dict = data
+                    
+                    # Compact orjson output; integer keys such as active hours become
+                    # strings as they did with json
+                    rows.append((key, stored_at, orjson.dumps(data_dict, option=orjson.OPT_NON_STR_KEYS)))
+                except Exception as e:
+                    logger.error(f"Error writing to cache: {e}")
+            self._dirty.clear()
+            
+            try:
+                with self._db_lock, self._db:
+                    logger.info(f"Writing {len(rows)} user cache entries to {self.cache_path}")
+                    self._db.executemany("INSERT OR REPLACE INTO cache (key, stored_at, data) VALUES (?, ?, ?)", rows)
+            except Exception as e:
+                logger.error(f"Error writing to cache: {e}")
+    
+    def export_version(self) -> str:
+        """
+        Get a version string of the chat export that changes whenever the file does.
+        
+        Cache keys include it, so entries built from an older export are never
+        served for a newer one.
+        """
         try:
-            # Ensure data is serializable by converting to dict
-            if isinstance(data, UserProfile):
-                data_dict = data.dict()
-            else:
-                data_dict = data
+            stat = os.stat(self.chat_parser.file_path)
+            return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        except OSError:
+            return "missing"
+    
+    def _get_aggregates(self) -> Dict[str, _UserStats]:
+        """
+        Aggregate the messages of every user in a single pass over the chat.
+        
+        Profiles then only look up their user instead of streaming the whole
+        export again each. The topic corpus is fitted on the users' texts at
+        the same time. The result is kept until the export changes.
+        """
+        version = self.export_version()
+        with self._aggregates_lock:
+            if self._aggregates is None or self._aggregates_version != version:
+                self._aggregates = _aggregate_messages(self.chat_parser.stream_messages(limit=None))
+                self._aggregates_version = version
                 
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                logger.info(f"Writing user profile to cache: {cache_path}")
-                json.dump(data_dict, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error writing to cache: {e}")
+                # Profile topics are weighted against every analyzed user's text,
+                # so the TF-IDF vocabulary is learned here once per export
+                if self.nlp_processor:
+                    texts = (self._nlp_texts(aggregate) for aggregate in self._aggregates.values())
+                    self.nlp_processor.fit_corpus([text[1] for text in texts if text is not None])
+            return self._aggregates
     
     def get_user_list(self) -> List[Dict[str, Any]]:
         """Get a list of all users in the chat with basic info."""
         # Try to get from cache
-        cache_key = "user_list"
+        cache_key = f"user_list_{self.export_version()}"
         cached_data = self._read_from_cache(cache_key)
         if cached_data:
             return cached_data
@@ -115,173 +450,189 @@ class UserAnalyzer:
         
         Args:
             user_id: User ID to analyze
-            
+        
         Returns:
             UserProfile object with detailed analytics
         """
         try:
             # Try to get from cache first
-            cache_key = f"user_profile_{user_id}"
+            cache_key = f"user_profile_{self.export_version()}_{user_id}"
             cached_profile = self._read_from_cache(cache_key)
             if cached_profile:
                 return cached_profile
             
-            messages = list(self.chat_parser.stream_messages(user_filter=[user_id], limit=None))
-            
-            if not messages:
+            # Statistics come from one pass over the whole chat shared by all users
+            aggregate = self._get_aggregates().get(user_id)
+            if aggregate is None:
                 return UserProfile(
                     user_id=user_id,
                     name="Unknown User",
                     message_count=0
                 )
             
-            # Basic user info
-            name = messages[0].from_name if messages else "Unknown User"
-            
-            # Message dates
-            dates = [datetime.fromisoformat(msg.date) for msg in messages if hasattr(msg, 'date')]
-            first_date = min(dates).isoformat() if dates else None
-            last_date = max(dates).isoformat() if dates else None
-            
-            # Count active days
-            active_days = len(set(d.date() for d in dates))
-            
-            # Activity patterns by hour and weekday
-            hours_count = Counter(d.hour for d in dates)
-            weekdays_count = Counter(d.weekday() for d in dates)
-            
-            # Media counts
-            media_count = defaultdict(int)
-            for msg in messages:
-                if hasattr(msg, 'media_type') and msg.media_type:
-                    media_count[msg.media_type] += 1
-                if hasattr(msg, 'photo') and msg.photo:
-                    media_count['photo'] = media_count.get('photo', 0) + 1
-            
-            # Count emojis
-            emoji_count = 0
-            for msg in messages:
-                if isinstance(msg.text, str):
-                    emoji_count += len([c for c in msg.text if c in emoji.EMOJI_DATA])
-                elif isinstance(msg.text, list):
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            emoji_count += len([c for c in item if c in emoji.EMOJI_DATA])
-                        elif isinstance(item, dict) and 'text' in item:
-                            emoji_count += len([c for c in item['text'] if c in emoji.EMOJI_DATA])
-            
-            # Count URL shares
-            link_count = 0
-            for msg in messages:
-                if isinstance(msg.text, str):
-                    link_count += len(self.url_pattern.findall(msg.text))
-                elif isinstance(msg.text, list):
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            link_count += len(self.url_pattern.findall(item))
-                        elif isinstance(item, dict) and 'text' in item:
-                            link_count += len(self.url_pattern.findall(item['text']))
-            
-            # Count forwarded messages
-            forwarded_count = sum(1 for msg in messages if hasattr(msg, 'forwarded_from') and msg.forwarded_from)
-            
-            # Calculate average message length
-            text_lengths = []
-            for msg in messages:
-                if isinstance(msg.text, str):
-                    text_lengths.append(len(msg.text))
-                elif isinstance(msg.text, list):
-                    text_content = ""
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            text_content += item
-                        elif isinstance(item, dict) and 'text' in item:
-                            text_content += item['text']
-                    text_lengths.append(len(text_content))
-            
-            avg_length = sum(text_lengths) / len(text_lengths) if text_lengths else 0
-            
-            # Extract message content for NLP analysis
-            all_text = []
-            for msg in messages:
-                if isinstance(msg.text, str):
-                    all_text.append(msg.text)
-                elif isinstance(msg.text, list):
-                    text_content = ""
-                    for item in msg.text:
-                        if isinstance(item, str):
-                            text_content += item
-                        elif isinstance(item, dict) and 'text' in item:
-                            text_content += item['text']
-                    all_text.append(text_content)
-            
-            # Get sentiment analysis
-            sentiment = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
-            if self.nlp_processor and all_text:
-                sentiment = self.nlp_processor.analyze_sentiment(" ".join(all_text[:100]))  # Limit to avoid overload
-            
-            # Get topic analysis
+            # Get sentiment and topic analysis
+            sentiment = self._default_sentiment(aggregate)
             topics = []
-            if self.nlp_processor and all_text:
-                topics = self.nlp_processor.extract_topics(" ".join(all_text[:200]))  # Limit to avoid overload
+            texts = self._nlp_texts(aggregate)
+            if texts is not None:
+                sentiment_text, topic_text = texts
+                sentiment = self.nlp_processor.analyze_sentiment(sentiment_text)
+                topics = self.nlp_processor.extract_topics_batch([topic_text])[0]
             
-            # User interactions (replies)
-            interactions = []
-            # This is a placeholder - you'd need to analyze reply_to_message_id and match with other messages
-            
-            # Generate a summary
-            summary = self._generate_user_summary(
-                name, 
-                len(messages), 
-                active_days, 
-                dict(hours_count), 
-                dict(weekdays_count),
-                avg_length,
-                emoji_count,
-                dict(media_count),
-                link_count,
-                forwarded_count,
-                topics,
-                sentiment
-            )
-            
-            # Create and return the profile
-            profile = UserProfile(
-                user_id=user_id,
-                name=name,
-                message_count=len(messages),
-                first_message_date=first_date,
-                last_message_date=last_date,
-                active_days=active_days,
-                active_hours=dict(hours_count),
-                active_weekdays=dict(weekdays_count),
-                topics=[{"topic": t[0], "weight": t[1]} for t in topics],
-                interaction_users=interactions,
-                avg_message_length=avg_length,
-                emoji_count=emoji_count,
-                media_count=dict(media_count),
-                link_count=link_count,
-                forwarded_count=forwarded_count,
-                sentiment=sentiment,
-                summary=summary
-            )
+            profile = self._build_profile(user_id, aggregate, sentiment, topics)
             
             # Cache the profile
             self._write_to_cache(cache_key, profile)
             
             return profile
-            
+        
         except Exception as e:
-            logger.error(f"Error generating user profile for {user_id}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return UserProfile(
-                user_id=user_id,
-                name="Error",
-                message_count=0,
-                summary=f"Error generating profile: {str(e)}"
-            )
+            logger.exception(f"Error generating user profile for {user_id}: {e}")
+            return self._error_profile(user_id, e)
+    
+    def get_user_profiles(self, user_ids: List[str]) -> List[UserProfile]:
+        """
+        Generate the profiles of many users, e.g. to warm the cache.
+        
+        The chat is aggregated once up front, and the sentiment and topics of
+        all uncached users are analyzed in one batch each; their cache
+        entries are flushed together at the end.
+        
+        Args:
+            user_ids: User IDs to analyze
+        
+        Returns:
+            UserProfile objects in the same order as the user IDs
+        """
+        version = self.export_version()
+        profiles = {}
+        for user_id in user_ids:
+            cached_profile = self._read_from_cache(f"user_profile_{version}_{user_id}")
+            if cached_profile:
+                profiles[user_id] = cached_profile
+        
+        missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in profiles]
+        if missing:
+            try:
+                aggregates = self._get_aggregates()
+                
+                # Only users with enough text go through the models
+                texts = {}
+                for user_id in missing:
+                    aggregate = aggregates.get(user_id)
+                    user_texts = self._nlp_texts(aggregate) if aggregate is not None else None
+                    if user_texts is not None:
+                        texts[user_id] = user_texts
+                sentiments = self.nlp_processor.analyze_sentiment_batch([sentiment_text for sentiment_text, _ in texts.values()])
+                topics = self.nlp_processor.extract_topics_batch([topic_text for _, topic_text in texts.values()])
+                analysis = dict(zip(texts, zip(sentiments, topics)))
+                
+                for user_id in missing:
+                    aggregate = aggregates.get(user_id)
+                    if aggregate is None:
+                        profiles[user_id] = UserProfile(
+                            user_id=user_id,
+                            name="Unknown User",
+                            message_count=0
+                        )
+                        continue
+                    sentiment, user_topics = analysis.get(user_id, (self._default_sentiment(aggregate), []))
+                    profile = self._build_profile(user_id, aggregate, sentiment, user_topics)
+                    self._write_to_cache(f"user_profile_{version}_{user_id}", profile)
+                    profiles[user_id] = profile
+            except Exception as e:
+                logger.exception(f"Error generating user profiles: {e}")
+                for user_id in missing:
+                    profiles.setdefault(user_id, self._error_profile(user_id, e))
+        
+        self._flush_cache()
+        return [profiles[user_id] for user_id in user_ids]
+    
+    @staticmethod
+    def _default_sentiment(aggregate: _UserStats) -> Dict[str, float]:
+        """Get the sentiment of a user whose texts are not analyzed: neutral if they wrote any text."""
+        if aggregate.all_text:
+            return {"positive": 0.0, "negative": 0.0, "neutral": 1.0}
+        return {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
+    
+    def _nlp_texts(self, aggregate: _UserStats) -> Optional[Tuple[str, str]]:
+        """
+        Get the texts to run sentiment and topic analysis on for a user.
+        
+        Returns:
+            The sentiment text and the topic text, or None if the user has
+            too little text to analyze
+        """
+        if not self.nlp_processor or not aggregate.all_text:
+            return None
+        
+        # Repeated texts (forwards, stock replies) add nothing to the analysis
+        texts = list(dict.fromkeys(aggregate.all_text))
+        
+        # A handful of short texts says nothing about mood or topics,
+        # so the models are not run for such users
+        if len(texts) < NLP_MIN_TEXTS or sum(map(len, texts)) < NLP_MIN_TEXT_LENGTH:
+            return None
+        
+        # Topics read every text and sentiment only the first ones, which
+        # are a prefix of the same joined string, so the texts are joined once
+        joined_text = " ".join(texts)
+        sentiment_end = sum(map(len, texts[:SENTIMENT_TEXT_LIMIT])) + SENTIMENT_TEXT_LIMIT - 1
+        return joined_text[:sentiment_end], joined_text
+    
+    def _build_profile(self, user_id: str, aggregate: _UserStats,
+                       sentiment: Dict[str, float], topics: List[Tuple[str, float]]) -> UserProfile:
+        """Assemble a user's profile from their statistics and text analysis."""
+        # User interactions (replies)
+        interactions = []
+        # This is a placeholder - you'd need to analyze reply_to_message_id and match with other messages
+        
+        # Generate a summary
+        summary = self._generate_user_summary(
+            aggregate.name,
+            aggregate.message_count,
+            aggregate.active_days,
+            dict(aggregate.hours_count),
+            dict(aggregate.weekdays_count),
+            aggregate.avg_length,
+            aggregate.emoji_count,
+            dict(aggregate.media_count),
+            aggregate.link_count,
+            aggregate.forwarded_count,
+            topics,
+            sentiment
+        )
+        
+        # Create and return the profile
+        return UserProfile(
+            user_id=user_id,
+            name=aggregate.name,
+            message_count=aggregate.message_count,
+            first_message_date=aggregate.first_date,
+            last_message_date=aggregate.last_date,
+            active_days=aggregate.active_days,
+            active_hours=dict(aggregate.hours_count),
+            active_weekdays=dict(aggregate.weekdays_count),
+            topics=[{"topic": t[0], "weight": t[1]} for t in topics],
+            interaction_users=interactions,
+            avg_message_length=aggregate.avg_length,
+            emoji_count=aggregate.emoji_count,
+            media_count=dict(aggregate.media_count),
+            link_count=aggregate.link_count,
+            forwarded_count=aggregate.forwarded_count,
+            sentiment=sentiment,
+            summary=summary
+        )
     
+    @staticmethod
+    def _error_profile(user_id: str, error: Exception) -> UserProfile:
+        """Get the placeholder profile returned when generating a profile fails."""
+        return UserProfile(
+            user_id=user_id,
+            name="Error",
+            message_count=0,
+            summary=f"Error generating profile: {str(error)}"
+        )
     def _generate_user_summary(self, 
                                name: str,
                                message_count: int,
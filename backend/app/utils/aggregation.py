@@ -0,0 +1,175 @@
+import os
+from collections import Counter
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+def _aggregate_by_user(codes, values, n_users, n_chunks):
+    """
+    Sum per-message metrics per user and record where each user first scored.
+
+    Each chunk of messages accumulates into its own slice of the output so
+    the parallel loop needs no atomics; the slices are reduced at the end.
+    """
+    n_metrics, n_rows = values.shape
+    totals = np.zeros((n_chunks, n_metrics, n_users), np.int64)
+    first = np.full((n_chunks, n_metrics, n_users), n_rows, np.int64)
+    step = (n_rows + n_chunks - 1) // n_chunks
+
+    for c in prange(n_chunks):
+        for i in range(c * step, min((c + 1) * step, n_rows)):
+            u = codes[i]
+            for m in range(n_metrics):
+                v = values[m, i]
+                if v > 0:
+                    totals[c, m, u] += v
+                    if first[c, m, u] == n_rows:
+                        first[c, m, u] = i
+
+    out_totals = np.zeros((n_metrics, n_users), np.int64)
+    out_first = np.full((n_metrics, n_users), n_rows, np.int64)
+    for c in range(n_chunks):
+        for m in range(n_metrics):
+            for u in range(n_users):
+                out_totals[m, u] += totals[c, m, u]
+                if first[c, m, u] < out_first[m, u]:
+                    out_first[m, u] = first[c, m, u]
+    return out_totals, out_first
+
+if njit is not None:
+    _aggregate_by_user = njit(cache=True, parallel=True)(_aggregate_by_user)
+
+HAVE_NUMBA = njit is not None
+
+def aggregate_by_user(codes: np.ndarray, values: np.ndarray, n_users: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate per-message metrics by user with the Numba kernel.
+
+    Args:
+        codes: int64 array of user codes (0..n_users-1), one per message
+        values: int64 array of shape (n_metrics, n_messages)
+        n_users: Number of distinct user codes
+
+    Returns:
+        Tuple of (totals, first) arrays of shape (n_metrics, n_users); ``first``
+        holds the index of the first message with a positive value, or
+        n_messages if there is none
+    """
+    n_chunks = max(1, min(os.cpu_count() or 1, len(codes) // 10000))
+    return _aggregate_by_user(codes, values, n_users, n_chunks)
+
+def bincount_by_user(codes: np.ndarray, values: np.ndarray, n_users: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate per-message metrics by user with vectorized NumPy reductions.
+
+    Same arguments and result as aggregate_by_user, for when Numba is missing.
+    """
+    n_metrics, n_rows = values.shape
+    totals = np.zeros((n_metrics, n_users), np.int64)
+    first = np.full((n_metrics, n_users), n_rows, np.int64)
+
+    for m in range(n_metrics):
+        rows = np.flatnonzero(values[m] > 0)
+        if len(rows) == 0:
+            continue
+        totals[m] = np.bincount(codes[rows], weights=values[m, rows], minlength=n_users)
+
+        # rows is ascending, so each user's first occurrence is their first positive message
+        users, at = np.unique(codes[rows], return_index=True)
+        first[m, users] = rows[at]
+    return totals, first
+
+def _bin_by_user(codes, bins, n_users, size, n_chunks):
+    """
+    Count small non-negative integers per user and record where each user first hit each.
+
+    Chunks accumulate into their own slices and are reduced at the end, as in
+    _aggregate_by_user.
+    """
+    n_rows = len(codes)
+    counts = np.zeros((n_chunks, n_users, size), np.int64)
+    first = np.full((n_chunks, n_users, size), n_rows, np.int64)
+    step = (n_rows + n_chunks - 1) // n_chunks
+
+    for c in prange(n_chunks):
+        for i in range(c * step, min((c + 1) * step, n_rows)):
+            u = codes[i]
+            b = bins[i]
+            counts[c, u, b] += 1
+            if first[c, u, b] == n_rows:
+                first[c, u, b] = i
+
+    out_counts = np.zeros((n_users, size), np.int64)
+    out_first = np.full((n_users, size), n_rows, np.int64)
+    for c in range(n_chunks):
+        for u in range(n_users):
+            for b in range(size):
+                out_counts[u, b] += counts[c, u, b]
+                if first[c, u, b] < out_first[u, b]:
+                    out_first[u, b] = first[c, u, b]
+    return out_counts, out_first
+
+if njit is not None:
+    _bin_by_user = njit(cache=True, parallel=True)(_bin_by_user)
+
+def bin_by_user(codes: np.ndarray, bins: np.ndarray, n_users: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count small non-negative integers (hours, weekdays) per user with the Numba kernel.
+
+    Args:
+        codes: int64 array of user codes (0..n_users-1), one per message
+        bins: int64 array of values in 0..size-1, one per message
+        n_users: Number of distinct user codes
+        size: Number of possible values
+
+    Returns:
+        Tuple of (counts, first) arrays of shape (n_users, size); ``first``
+        holds the index of the user's first message with that value, or
+        n_messages if there is none
+    """
+    n_chunks = max(1, min(os.cpu_count() or 1, len(codes) // 10000))
+    return _bin_by_user(codes, bins, n_users, size, n_chunks)
+
+def bincount_bins_by_user(codes: np.ndarray, bins: np.ndarray, n_users: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count small non-negative integers per user with vectorized NumPy reductions.
+
+    Same arguments and result as bin_by_user, for when Numba is missing.
+    """
+    keys = codes * size + bins
+    counts = np.bincount(keys, minlength=n_users * size).reshape(n_users, size)
+    first = np.full(n_users * size, len(codes), np.int64)
+    seen, at = np.unique(keys, return_index=True)
+    first[seen] = at
+    return counts, first.reshape(n_users, size)
+
+def rank_users(totals: np.ndarray, first: np.ndarray, n: int = 20) -> np.ndarray:
+    """
+    Get the codes of the n users with the highest positive totals.
+
+    Ties are broken by the position of each user's first positive message,
+    matching the insertion order Counter.most_common uses.
+    """
+    positive = np.flatnonzero(totals > 0)
+    if len(positive) > n:
+        # Only users at or above the n-th largest total can make the cut
+        cutoff = np.partition(totals[positive], len(positive) - n)[len(positive) - n]
+        positive = positive[totals[positive] >= cutoff]
+    order = np.lexsort((first[positive], -totals[positive]))
+    return positive[order[:n]]
+
+def count_bins(values: np.ndarray, size: int) -> Counter:
+    """
+    Count small non-negative integers (hours, weekdays) in a fixed-size array.
+
+    The Counter's keys keep first-seen order, as per-item counting would, so
+    most_common() breaks ties the same way.
+    """
+    counts = np.bincount(values, minlength=size)
+    return Counter({value: int(counts[value]) for value in pd.unique(values).tolist()})
@@ -0,0 +1,164 @@
+import json
+import re
+from typing import Iterator, List, Optional, Tuple
+
+_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+_INDENT = re.compile(rb'[ \t]*')
+
+def find_array(buf, key: str) -> int:
+    """
+    Find the opening bracket of a top-level array in a JSON document.
+
+    Args:
+        buf: The document as bytes or an mmap
+        key: Name of the key holding the array
+
+    Returns:
+        Offset of the '[' that starts the array
+
+    Raises:
+        ValueError: If the key is not followed by an array
+    """
+    needle = b'"' + key.encode('utf-8') + b'"'
+    pos = buf.find(needle)
+    if pos == -1:
+        raise ValueError(f"Key {key!r} not found")
+
+    pos = _WHITESPACE.match(buf, pos + len(needle)).end()
+    if buf[pos:pos + 1] != b':':
+        raise ValueError(f"Key {key!r} is not followed by a value")
+
+    pos = _WHITESPACE.match(buf, pos + 1).end()
+    if buf[pos:pos + 1] != b'[':
+        raise ValueError(f"Key {key!r} does not hold an array")
+    return pos
+
+def _array_layout(buf, array_start: int) -> Optional[Tuple[int, bytes]]:
+    """Get the first element offset and element closer of an array, or None if it is empty."""
+    pos = _WHITESPACE.match(buf, array_start + 1).end()
+    if buf[pos:pos + 1] == b']':
+        return None
+    if buf[pos:pos + 1] != b'{':
+        raise ValueError("Array elements are not objects")
+
+    line_start = buf.rfind(b'\n', array_start, pos) + 1
+    if line_start == 0:
+        raise ValueError("Array is not pretty-printed")
+    return pos, b'\n' + buf[line_start:pos] + b'}'
+
+def iter_object_spans(buf, array_start: int, start: Optional[int] = None,
+                      stop: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """
+    Locate the objects of a pretty-printed JSON array without parsing them.
+
+    Raw newlines cannot occur inside JSON strings, so in an indented document
+    an element's closing brace is the first newline + element indent + '}'
+    after its opening brace. Each element can then be handed to a fast parser
+    on its own.
+
+    Args:
+        buf: The document as bytes or an mmap
+        array_start: Offset of the array's '[' (see find_array)
+        start: Offset of the element to begin at (defaults to the first one)
+        stop: Stop before the first element starting at or after this offset
+
+    Returns:
+        Iterator of (start, end) offsets, one per element
+
+    Raises:
+        ValueError: If the array is not laid out one indented element per line
+    """
+    layout = _array_layout(buf, array_start)
+    if layout is None:
+        return iter(())
+    first, closer = layout
+    if stop is None:
+        stop = len(buf)
+
+    def spans(start):
+        while start < stop:
+            end = buf.find(closer, start)
+            if end == -1:
+                raise ValueError("Unterminated array element")
+            end += len(closer)
+            yield start, end
+
+            # Step over the separator to the next element or the closing bracket
+            pos = _WHITESPACE.match(buf, end).end()
+            sep = buf[pos:pos + 1]
+            if sep == b']':
+                return
+            if sep != b',':
+                raise ValueError(f"Unexpected byte {sep!r} after array element")
+            start = _WHITESPACE.match(buf, pos + 1).end()
+
+    return spans(first if start is None else start)
+
+def split_object_array(buf, array_start: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    Split a pretty-printed JSON array into byte ranges on element boundaries.
+
+    Each range starts at an element's opening brace, so it can be passed as
+    start/stop to iter_object_spans independently of the others.
+
+    Args:
+        buf: The document as bytes or an mmap
+        array_start: Offset of the array's '[' (see find_array)
+        parts: Desired number of ranges; fewer are returned for small arrays
+
+    Returns:
+        List of (start, stop) offsets in document order
+    """
+    layout = _array_layout(buf, array_start)
+    if layout is None:
+        return []
+    first, closer = layout
+
+    bounds = [first]
+    for i in range(1, parts):
+        target = first + (len(buf) - first) * i // parts
+        if target <= bounds[-1]:
+            continue
+
+        # The next closer ends the element containing the target offset
+        end = buf.find(closer, target)
+        if end == -1:
+            break
+        pos = _WHITESPACE.match(buf, end + len(closer)).end()
+        if buf[pos:pos + 1] != b',':
+            break
+        bounds.append(_WHITESPACE.match(buf, pos + 1).end())
+
+    return list(zip(bounds, bounds[1:] + [len(buf)]))
+
+def field_marker(buf, array_start: int, key: str, value: str) -> Optional[bytes]:
+    """
+    Get the bytes that mark an array element whose own `key` holds string `value`.
+
+    In a pretty-printed array an element's members sit on lines of one fixed
+    indent, deeper than any member of a nested object, so the marker is that
+    newline and indent followed by the encoded member. Searching an element's
+    span for it tells whether the element matches without parsing it. The
+    marker assumes json.dumps separators (': '); other layouts simply never
+    match.
+
+    Args:
+        buf: The document as bytes or an mmap
+        array_start: Offset of the array's '[' (see find_array)
+        key: Member name
+        value: String value of the member
+
+    Returns:
+        The marker, or None if the array is empty
+    """
+    layout = _array_layout(buf, array_start)
+    if layout is None:
+        return None
+    first, _ = layout
+
+    newline = buf.find(b'\n', first)
+    if newline == -1:
+        return None
+    indent_end = _INDENT.match(buf, newline + 1).end()
+    member = json.dumps(key, ensure_ascii=False) + ': ' + json.dumps(value, ensure_ascii=False)
+    return buf[newline:indent_end] + member.encode('utf-8')
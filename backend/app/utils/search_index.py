@@ -0,0 +1,59 @@
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+import numpy as np
+
+# Word tokens used as index keys; text is casefolded so it lines up with re.IGNORECASE
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Characters that give a query meaning beyond a literal substring
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+class SearchIndex:
+    """
+    Inverted index from word tokens to message positions.
+
+    The index only narrows a search down to candidate messages; callers still
+    run the real pattern over them. A query word may sit inside a longer word
+    of a message, so it is looked up in every indexed token that contains it.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        """
+        Build the index.
+
+        Args:
+            texts: Flattened message text, one entry per message position
+        """
+        postings = defaultdict(list)
+        for position, text in enumerate(texts):
+            for token in set(TOKEN_PATTERN.findall(text.casefold())):
+                postings[token].append(position)
+        self.postings = {token: np.array(positions, dtype=np.int64) for token, positions in postings.items()}
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """
+        Get the positions of messages that may contain a case-insensitive query.
+
+        Args:
+            query: The search query
+
+        Returns:
+            Sorted array of message positions, or None if the query is a regular
+            expression or has no word characters and needs a full scan
+        """
+        if any(c in _REGEX_SPECIAL for c in query):
+            return None
+        words = set(TOKEN_PATTERN.findall(query.casefold()))
+        if not words:
+            return None
+
+        result = None
+        for word in words:
+            matches = [positions for token, positions in self.postings.items() if word in token]
+            if not matches:
+                return np.empty(0, dtype=np.int64)
+
+            found = np.unique(np.concatenate(matches))
+            result = found if result is None else np.intersect1d(result, found, assume_unique=True)
+        return result
@@ -6,6 +6,11 @@ import emoji
 URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
 EMOJI_PATTERN = re.compile(r':[a-zA-Z0-9_]+:')
 
+# Every single-character emoji, bound once; counting maps the set's
+# __contains__ over a string, which tests each character in C (a character
+# class of ~1400 emoji made the regex engine scan it linearly per character)
+EMOJI_CHARS = frozenset(e for e in emoji.EMOJI_DATA if len(e) == 1)
+
 def extract_text_content(text_obj: Union[str, List, Dict]) -> str:
     """
     Extract plain text content from complex text structures.
@@ -44,7 +49,9 @@ def count_emojis(text: Union[str, List, Dict]) -> int:
         Number of emojis
     """
     content = extract_text_content(text)
-    return len([c for c in content if c in emoji.EMOJI_DATA])
+    if content.isascii():
+        return 0
+    return sum(map(EMOJI_CHARS.__contains__, content))
 
 def count_urls(text: Union[str, List, Dict]) -> int:
     """
@@ -57,8 +64,39 @@ def count_urls(text: Union[str, List, Dict]) -> int:
         Number of URLs
     """
     content = extract_text_content(text)
+    if 'http' not in content and 'www.' not in content:
+        return 0
     return len(URL_PATTERN.findall(content))
 
+def text_stats(text_obj: Union[str, List, Dict]) -> Tuple[str, int, int]:
+    """
+    Flatten text once and count its emojis and URLs.
+    
+    URLs in a list of text entities are counted per entity, so a link is
+    not merged with the text that follows it.
+    
+    Args:
+        text_obj: Text object from a message, which can be a string, list, or dictionary
+        
+    Returns:
+        Tuple of (plain text content, number of emojis, number of URLs)
+    """
+    if isinstance(text_obj, list):
+        parts = [item if isinstance(item, str) else item['text'] for item in text_obj
+                 if isinstance(item, str) or (isinstance(item, dict) and 'text' in item)]
+        content = "".join(parts)
+    else:
+        content = extract_text_content(text_obj)
+        parts = (content,)
+    
+    emojis = 0 if content.isascii() else sum(map(EMOJI_CHARS.__contains__, content))
+    
+    # The flattened text tells whether any part can hold a URL at all
+    urls = 0
+    if 'http' in content or 'www.' in content:
+        urls = sum(len(URL_PATTERN.findall(part)) for part in parts if 'http' in part or 'www.' in part)
+    return content, emojis, urls
+
 def truncate_text(text: str, max_length: int = 100) -> str:
     """
     Truncate text to a maximum length.
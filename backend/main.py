@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import pathlib
+from contextlib import asynccontextmanager
 
 # Import routers
 from app.routers import chat_data, analysis, users, search
@@ -15,11 +16,21 @@ data_file = os.path.join(root_dir, "result.json")
 # Set the environment variable to use the real data file
 os.environ["CHAT_FILE_PATH"] = str(data_file)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared services at startup instead of on the first request."""
+    parser = chat_data.get_chat_parser()
+    nlp_processor = users.get_nlp_processor()
+    users.get_user_analyzer(parser, nlp_processor)
+    analysis.get_analytics_service(parser, nlp_processor)
+    yield
+
 # Create FastAPI app
 app = FastAPI(
     title="Telegram Group Chat Profiler",
     description="A web application to analyze Telegram group chat exports",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS